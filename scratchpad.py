@@ -1,23 +1,16 @@
-import csv
+from bigsky import __version__
+from bigsky.catalog import Catalog
 
-bayer = {}
-flamsteed = {}
+stars = Catalog(f"build/bigsky.{__version__}.stars")
 
-with open("build/bigsky.stars.csv", "r") as starfile:
-    reader = csv.DictReader(starfile)
-    for row in reader:
-        hip_id = row["hip_id"]
-        
-        if not hip_id:
-            continue
+hip = stars.hip_id
+has_bayer = (hip > 0) & (stars.column("bayer") >= 0)
+has_flamsteed = (hip > 0) & (stars.column("flamsteed") > 0)
 
-        hip_id = int(hip_id)
-
-        if row["bayer"]:
-            bayer[hip_id] = row["bayer"]
-        
-        if row["flamsteed"]:
-            flamsteed[hip_id] = int(row["flamsteed"])
+bayer = dict(zip(hip[has_bayer].tolist(), stars.decode("bayer", has_bayer)))
+flamsteed = dict(
+    zip(hip[has_flamsteed].tolist(), stars.column("flamsteed")[has_flamsteed].tolist())
+)
 
 print(bayer)
 print(flamsteed)
@@ -0,0 +1,3 @@
+from bigsky.cli import main
+
+main()
@@ -0,0 +1,353 @@
+"""
+Benchmarks the stars build with synthetic raw data (Tycho-2 main catalog and supplement, Tycho-1 and the
+identifier tables), so the time of each stage of the build can be measured without the real data:
+
+    PYTHONPATH=./src/ python -m bigsky.benchmarks.stars --scales 10000,100000
+
+Use `--save-baseline` to record the results as the baseline (see `BASELINE_PATH`), and `--compare` to compare the
+results to the baseline, which exits with an error if any stage is slower than its baseline by more than the
+tolerance. Baselines are only comparable on the same machine, so record one before making changes:
+
+    PYTHONPATH=./src/ python -m bigsky.benchmarks.stars --scales 100000 --save-baseline
+    (make changes)
+    PYTHONPATH=./src/ python -m bigsky.benchmarks.stars --scales 100000 --compare
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bigsky import __version__ as VERSION
+from bigsky.builders import stars
+from bigsky.builders.stars import TYCHO2_LAYOUT
+
+SCALES = (10_000, 100_000, 1_000_000)
+"""Numbers of Tycho-2 stars (the full Tycho-2 main catalog has about 2.5M)"""
+
+BASELINE_PATH = stars.BUILD_PATH / "benchmarks" / "stars.baseline.json"
+"""Default path of the baseline, in the build directory because baselines are specific to the machine"""
+
+TOLERANCE = 1.5
+"""Maximum ratio of a stage's time to its baseline time in comparisons"""
+
+MIN_SECONDS = 0.05
+"""Stages faster than this (in the results and the baseline) aren't compared, because their times are mostly noise"""
+
+HIP_FRACTION = 0.1
+SUPPLEMENT_FRACTION = 0.01
+TYCHO1_FRACTION = 0.1
+
+TEST_DATA_PATH = Path(__file__).parent.parent / "tests" / "data"
+
+
+def fixed_width(values: list[str], width: int) -> np.ndarray:
+    """Returns strings as an (n, width) array of bytes, right-aligned"""
+    field = np.array([v.rjust(width)[:width] for v in values], dtype=f"S{width}")
+    return field.view(np.uint8).reshape(len(values), width)
+
+
+def sky_positions(rng, count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Returns random positions (in degrees), uniform over the sky"""
+    ra = rng.uniform(0, 360, count)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+    return ra, dec
+
+
+def tycho2_records(rng, first_tyc: int, count: int, hip_ids: np.ndarray) -> np.ndarray:
+    """
+    Returns `count` random Tycho-2 main catalog records as an (n, record length) array of bytes, based on a record
+    of the test data. Stars get consecutive Tycho ids, starting at `first_tyc`, and `hip_ids` (0 for none).
+    """
+    with open(TEST_DATA_PATH / "tyc2.dat", "rb") as infile:
+        template = np.frombuffer(infile.readline(), dtype=np.uint8)
+
+    records = np.tile(template, (count, 1))
+    tyc = np.arange(first_tyc, first_tyc + count)
+    ra, dec = sky_positions(rng, count)
+    pm = rng.normal(0, 30, (2, count))
+    no_pm = rng.random(count) < 0.05
+    bt = rng.uniform(3, 13, count)
+    vt = bt - rng.uniform(0, 1.5, count)
+    epochs = rng.uniform(0, 2.5, (2, count))
+
+    fields = {
+        "tyc1": [f"{t // 1000 + 1:04}" for t in tyc.tolist()],
+        "tyc2": [f"{t % 1000 + 1:05}" for t in tyc.tolist()],
+        "tyc3": ["1"] * count,
+        "pm_ra": ["" if n else f"{v:.1f}" for v, n in zip(pm[0].tolist(), no_pm)],
+        "pm_dec": ["" if n else f"{v:.1f}" for v, n in zip(pm[1].tolist(), no_pm)],
+        "bt": [f"{v:.3f}" for v in bt.tolist()],
+        "vt": [f"{v:.3f}" for v in vt.tolist()],
+        "hip": [f"{h}" if h else "" for h in hip_ids.tolist()],
+        "ccdm": [""] * count,
+        "ra": [f"{v:.8f}" for v in ra.tolist()],
+        "dec": [f"{v:.8f}" for v in dec.tolist()],
+        "ep_ra": [f"{v:.2f}" for v in epochs[0].tolist()],
+        "ep_dec": [f"{v:.2f}" for v in epochs[1].tolist()],
+    }
+
+    for name, values in fields.items():
+        start, end = TYCHO2_LAYOUT[name]
+        records[:, start:end] = fixed_width(values, end - start)
+
+    return records
+
+
+def supplement_lines(rng, first_tyc: int, count: int) -> list[str]:
+    """Returns `count` random lines of the Tycho-2 supplement, based on a line of the test data"""
+    with open(TEST_DATA_PATH / "tyc2_suppl.dat", "r") as infile:
+        template = infile.readline().rstrip("\n").split("|")
+
+    ra, dec = sky_positions(rng, count)
+    pm = rng.normal(0, 30, (2, count))
+    vt = rng.uniform(3, 12, count)
+    lines = []
+
+    for i, values in enumerate(zip(ra.tolist(), dec.tolist(), *pm.tolist(), vt)):
+        r, d, pm_ra, pm_dec, v = values
+        tyc = first_tyc + i
+        row = list(template)
+        row[0] = f"{tyc // 1000 + 1:04} {tyc % 1000 + 1:05} 1"
+        row[2] = f"{r:012.8f}"
+        row[3] = f"{d:+012.8f}"
+        row[4] = f"{pm_ra:7.1f}"
+        row[5] = f"{pm_dec:7.1f}"
+        row[11] = f"{v + 0.5:6.3f}"
+        row[13] = f"{v:6.3f}"
+        lines.append("|".join(row) + "\n")
+
+    return lines
+
+
+def tycho1_line(catalog: str, key: str, magnitude, parallax, pm_ra, pm_dec) -> str:
+    """Returns a line of the Tycho-1 `hip_main.dat` (catalog "H") or `tyc_main.dat` (catalog "T")"""
+    row = [catalog, key, " ", "", "", f"{magnitude:6.2f}"] + [""] * 5
+    row += [f"{parallax:6.2f}", f"{pm_ra:8.2f}", f"{pm_dec:8.2f}"]
+    return "|".join(row) + "\n"
+
+
+def write_raw(data_path: Path, rows: int, seed: int = 42):
+    """
+    Writes a synthetic raw data directory for the stars build, with `rows` Tycho-2 stars (spread over the 20 files
+    of the main catalog) at random positions, plus a supplement of `SUPPLEMENT_FRACTION` of `rows`.
+
+    A fraction (`HIP_FRACTION`) of the stars are Hipparcos stars, which are all in `hip_main.dat`, and some of them
+    are in the cross reference and have IAU names. A fraction (`TYCHO1_FRACTION`) of the other stars are in
+    `tyc_main.dat`.
+    """
+    rng = np.random.default_rng(seed)
+    data_path = Path(data_path)
+
+    for directory in ["tycho-1", "tycho-2", "IV_27A", "iau-star-names"]:
+        (data_path / directory).mkdir(parents=True, exist_ok=True)
+
+    is_hip = rng.random(rows) < HIP_FRACTION
+    hip_ids = np.where(is_hip, np.cumsum(is_hip), 0)
+    bounds = np.linspace(0, rows, 21).astype(int)
+
+    for t in range(0, 20):
+        start, end = bounds[t], bounds[t + 1]
+        records = tycho2_records(rng, start, end - start, hip_ids[start:end])
+
+        with open(data_path / "tycho-2" / f"tyc2.dat.{t:02}", "wb") as outfile:
+            outfile.write(records.tobytes())
+
+    with open(data_path / "tycho-2" / "suppl_1.dat", "w") as outfile:
+        outfile.writelines(supplement_lines(rng, rows, int(rows * SUPPLEMENT_FRACTION)))
+
+    hip = hip_ids[is_hip].tolist()
+    magnitudes = rng.uniform(2, 12, len(hip)).tolist()
+    parallaxes = rng.exponential(5, len(hip)).tolist()
+    pm = rng.normal(0, 30, (2, len(hip))).tolist()
+
+    with open(data_path / "tycho-1" / "hip_main.dat", "w") as outfile:
+        for values in zip(hip, magnitudes, parallaxes, *pm):
+            outfile.write(tycho1_line("H", f"{values[0]:12}", *values[1:]))
+
+    tycho1 = np.flatnonzero(~is_hip & (rng.random(rows) < TYCHO1_FRACTION))
+
+    with open(data_path / "tycho-1" / "tyc_main.dat", "w") as outfile:
+        for t in tycho1.tolist():
+            key = f"{t // 1000 + 1:4} {t % 1000 + 1:4} 1"
+            outfile.write(tycho1_line("T", key, rng.uniform(8, 12), 0, 0, 0))
+
+    with open(data_path / "IV_27A" / "catalog.dat", "w") as outfile:
+        for i, h in enumerate(hip[::10]):
+            bayer = ["alf", "bet", "gam"][i % 3] if i % 5 == 0 else ""
+            flamsteed = f"{i % 100 + 1:4}" if i % 2 == 0 else "    "
+            outfile.write(
+                f"{i + 1:7}".ljust(31) + f"{h:7}".ljust(33) + flamsteed + bayer + "\n"
+            )
+
+    with open(data_path / "iau-star-names" / "iau-star-names-2024.csv", "w") as outfile:
+        outfile.write("name,designation,hip\n")
+        for i, h in enumerate(hip[::100]):
+            outfile.write(f"Star{i},HIP {h},{h}\n")
+
+
+def stage_seconds(metrics: dict) -> dict:
+    """
+    Returns the seconds of each stage of a build, from its metrics: loading the references, the stages of the
+    pipeline (summed over all shards, see `bigsky.builders.stars.build_metrics`), and merging, sorting and writing
+    the catalog.
+    """
+    seconds = {"references": metrics["stages"]["references"]["seconds"]}
+    seconds.update(metrics["pipeline"])
+
+    for name, stage in metrics["stages"].items():
+        if name not in stars.STAGES and name != "references":
+            seconds[name] = stage["seconds"]
+
+    return seconds
+
+
+def run(scales: tuple[int] = SCALES, formats=("numpy",), seed: int = 42) -> dict:
+    """Builds the stars from synthetic data at each scale, and returns the results keyed by scale"""
+    results = {}
+
+    for rows in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_path, build_path = Path(tmp) / "raw", Path(tmp) / "build"
+
+            generate_start = time.perf_counter()
+            write_raw(data_path, rows, seed)
+            generate_seconds = time.perf_counter() - generate_start
+
+            metrics = stars.build(
+                data_path=data_path,
+                build_path=build_path,
+                workers=1,
+                cache=False,
+                formats=formats,
+            )
+
+        total = metrics["total"]["seconds"]
+        results[str(rows)] = {
+            "rows": metrics["total"]["rows"],
+            "generate_seconds": round(generate_seconds, 3),
+            "seconds": total,
+            "rows_per_second": round(metrics["total"]["rows"] / total) if total else 0,
+            "stages": stage_seconds(metrics),
+        }
+
+    return results
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    tolerance: float = TOLERANCE,
+    min_seconds: float = MIN_SECONDS,
+) -> list[str]:
+    """
+    Returns a description of each regression of the results from the baseline: each stage (and total) that took
+    more than `tolerance` times its baseline time. Scales and stages that aren't in the baseline are skipped.
+    """
+    regressions = []
+
+    for scale, result in results.items():
+        expected = baseline.get(scale)
+
+        if expected is None:
+            continue
+
+        timings = dict(result["stages"], total=result["seconds"])
+        expected_timings = dict(expected["stages"], total=expected["seconds"])
+
+        for name, seconds in timings.items():
+            expected_seconds = expected_timings.get(name)
+
+            if expected_seconds is None or max(seconds, expected_seconds) < min_seconds:
+                continue
+
+            if seconds > max(expected_seconds, min_seconds) * tolerance:
+                regressions.append(
+                    f"{int(scale):,} rows: {name} took {seconds:.3f} s "
+                    f"(baseline {expected_seconds:.3f} s)"
+                )
+
+    return regressions
+
+
+def read_baseline(path: Path = BASELINE_PATH) -> dict:
+    with open(path, "r") as infile:
+        return json.load(infile)["results"]
+
+
+def write_baseline(results: dict, path: Path = BASELINE_PATH, formats=("numpy",)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "w") as outfile:
+        json.dump(
+            {"version": VERSION, "formats": list(formats), "results": results},
+            outfile,
+            indent=2,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bigsky.benchmarks.stars")
+    parser.add_argument(
+        "--scales",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=list(SCALES),
+        help=f"Comma-separated numbers of Tycho-2 stars (default: {','.join(str(s) for s in SCALES)})",
+    )
+    parser.add_argument(
+        "--formats",
+        type=lambda value: value.split(","),
+        default=["numpy"],
+        help="Comma-separated output formats (default: numpy)",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save the results as the baseline",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare the results to the baseline, and exit with an error on regressions",
+    )
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.compare and not args.save_baseline and not args.baseline.exists():
+        parser.error(
+            f"no baseline at {args.baseline}: record one on this machine with --save-baseline first"
+        )
+
+    results = run(args.scales, args.formats)
+
+    for scale, result in results.items():
+        print(
+            f"{int(scale):>9,} stars: {result['seconds']:.3f} s, "
+            f"{result['rows_per_second']:,} rows/s"
+        )
+        for name, seconds in result["stages"].items():
+            print(f"    {name:<14}{seconds:>9.3f} s")
+
+    if args.save_baseline:
+        write_baseline(results, args.baseline, args.formats)
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(results, read_baseline(args.baseline), args.tolerance)
+
+        for regression in regressions:
+            print(f"Regression: {regression}")
+
+        if regressions:
+            sys.exit(1)
+
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
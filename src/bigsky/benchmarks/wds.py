@@ -0,0 +1,100 @@
+"""
+Benchmarks loading the WDS catalog into SQLite with synthetic data, to check that loading takes linear time
+(i.e. that the time per line doesn't grow with the size of the file):
+
+    PYTHONPATH=./src/ python -m bigsky.benchmarks.wds
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bigsky.loaders.utils import db, init_db
+from bigsky.loaders.wds import load_wds
+
+SIZES = (25_000, 50_000, 100_000, 150_000)
+"""Numbers of lines (the full WDS has about 150k)"""
+
+
+def wds_line(wds_id: str, ra: float, dec: float) -> str:
+    """Returns a WDS line with an id and a position (RA in hours, declination in degrees)"""
+    ra_s = ra * 3600
+    dec_s = abs(dec) * 3600
+    coords = (
+        f"{int(ra_s // 3600):02}{int(ra_s % 3600 // 60):02}{ra_s % 60:05.2f}"
+        f"{'-' if dec < 0 else '+'}"
+        f"{int(dec_s // 3600):02}{int(dec_s % 3600 // 60):02}{dec_s % 60:04.1f}"
+    )
+    return f"{wds_id:<17}".ljust(112) + coords + "\n"
+
+
+def write_wds(datapath: Path, lines: int, duplicates: float = 0.05, seed: int = 42):
+    """Writes a synthetic `wds/wds_all.txt` with random positions, and a fraction of lines with duplicate ids"""
+    rng = np.random.default_rng(seed)
+    ra = rng.uniform(0, 24, lines)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, lines)))
+    ids = np.arange(lines)
+    dupes = rng.random(lines) < duplicates
+    ids[dupes] = rng.integers(0, lines, dupes.sum())
+
+    (datapath / "wds").mkdir(parents=True, exist_ok=True)
+
+    with open(datapath / "wds" / "wds_all.txt", "w") as outfile:
+        for i, r, d in zip(ids.tolist(), ra.tolist(), dec.tolist()):
+            outfile.write(wds_line(f"{i:010}", r, d))
+
+
+def run(sizes: tuple[int] = SIZES) -> list[dict]:
+    results = []
+
+    for lines in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            datapath = Path(tmp)
+            write_wds(datapath, lines)
+            init_db(str(datapath / "bigsky.db"), bulk=True)
+
+            start = time.perf_counter()
+            duplicates = load_wds(str(datapath))
+            seconds = time.perf_counter() - start
+
+            db.close()
+
+        results.append(
+            {
+                "lines": lines,
+                "duplicates": duplicates.total(),
+                "seconds": round(seconds, 3),
+                "us_per_line": round(seconds / lines * 1e6, 2),
+            }
+        )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bigsky.benchmarks.wds")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=list(SIZES),
+        help=f"Comma-separated numbers of lines (default: {','.join(str(s) for s in SIZES)})",
+    )
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+
+    for result in results:
+        print(
+            f"{result['lines']:>9,} lines ({result['duplicates']:,} duplicates): "
+            f"{result['seconds']:.3f} s, {result['us_per_line']:.2f} us/line"
+        )
+
+    growth = results[-1]["us_per_line"] / results[0]["us_per_line"]
+    print(f"Time per line grows {growth:.2f}x from smallest to largest (1x is linear)")
+
+
+if __name__ == "__main__":
+    main()
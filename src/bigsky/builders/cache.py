@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+CACHE_VERSION = 2
+"""Bump this when the format of any cached value changes, to invalidate all caches"""
+
+DIGESTS_FILENAME = "digests.json"
+
+
+def _read_digests(cache_path: Path) -> dict:
+    try:
+        with open(cache_path / DIGESTS_FILENAME, "r") as infile:
+            return json.load(infile)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_atomic(filename: Path, write_fn, mode="wb"):
+    """Writes to a temporary file first, so concurrent readers never see a partial file"""
+    tmp_filename = filename.with_name(f".{filename.name}.{os.getpid()}.tmp")
+
+    with open(tmp_filename, mode) as outfile:
+        write_fn(outfile)
+
+    os.replace(tmp_filename, filename)
+
+
+def file_digest(filename: Path, cache_path: Path = None) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+
+    If `cache_path` is given, digests are remembered there by the file's size and modification time, so unchanged
+    files are only hashed once.
+    """
+    filename = Path(filename).resolve()
+    stat = filename.stat()
+    stamp = [stat.st_size, stat.st_mtime_ns]
+
+    if cache_path:
+        digests = _read_digests(cache_path)
+        known = digests.get(str(filename))
+        if known and known["stamp"] == stamp:
+            return known["sha256"]
+
+    sha = hashlib.sha256()
+    with open(filename, "rb") as infile:
+        for block in iter(lambda: infile.read(1 << 20), b""):
+            sha.update(block)
+
+    digest = sha.hexdigest()
+
+    if cache_path:
+        cache_path.mkdir(parents=True, exist_ok=True)
+        digests = _read_digests(cache_path)
+        digests[str(filename)] = {"stamp": stamp, "sha256": digest}
+        _write_atomic(
+            cache_path / DIGESTS_FILENAME,
+            lambda f: json.dump(digests, f, indent=2),
+            mode="w",
+        )
+
+    return digest
+
+
+def sources_digest(sources: list[Path], cache_path: Path = None) -> str:
+    """Returns a digest of the contents of all the source files (and the cache version)"""
+    sha = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+
+    for source in sources:
+        sha.update(file_digest(source, cache_path).encode())
+
+    return sha.hexdigest()
+
+
+def cached(name: str, sources: list[Path], fn, cache_path: Path = None):
+    """
+    Returns the value of `fn()`, cached on disk in `cache_path` and keyed by the contents of the `sources` files.
+
+    The value is recalculated (and the stale cache files of `name` are removed) when any of the sources change.
+    If `cache_path` is None, then `fn()` is always called.
+    """
+    if cache_path is None:
+        return fn()
+
+    cache_path = Path(cache_path)
+    key = sources_digest(sources, cache_path)[:16]
+    filename = cache_path / f"{name}.{key}.pickle"
+
+    if filename.exists():
+        with open(filename, "rb") as infile:
+            return pickle.load(infile)
+
+    value = fn()
+
+    for stale in cache_path.glob(f"{name}.*.pickle"):
+        stale.unlink(missing_ok=True)
+
+    _write_atomic(
+        filename, lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    )
+
+    return value
+
+
+def cached_arrays(name: str, key: str, fn, cache_path: Path = None) -> dict:
+    """
+    Returns the dictionary of NumPy arrays returned by `fn()`, cached on disk in `cache_path` as an .npz file and
+    keyed by `key` (e.g. a digest of everything the arrays are computed from).
+
+    The arrays are recalculated (and the stale cache files of `name` are removed) when the key changes. If
+    `cache_path` is None, then `fn()` is always called.
+    """
+    if cache_path is None:
+        return fn()
+
+    cache_path = Path(cache_path)
+    filename = cache_path / f"{name}.{key[:16]}.npz"
+
+    if filename.exists():
+        with np.load(filename) as npz:
+            return {k: npz[k] for k in npz.files}
+
+    arrays = fn()
+
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    for stale in cache_path.glob(f"{name}.*.npz"):
+        stale.unlink(missing_ok=True)
+
+    _write_atomic(filename, lambda f: np.savez(f, **arrays))
+
+    return arrays
+
+
+def array_digest(arrays: list[np.ndarray], salt: str = "") -> str:
+    """
+    Returns the SHA-256 hex digest of the contents of numeric NumPy arrays (with their dtypes and shapes), and of
+    `salt` (e.g. the version of whatever computes values from the arrays)
+    """
+    sha = hashlib.sha256(f"v{CACHE_VERSION}:{salt}".encode())
+
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        sha.update(f"{array.dtype.str}{array.shape}".encode())
+        sha.update(array.data)
+
+    return sha.hexdigest()
+
+
+def stored_arrays(key: str, fn, store_path: Path = None) -> dict:
+    """
+    Returns the dictionary of NumPy arrays returned by `fn()`, from a content-addressed store in `store_path`.
+
+    Unlike `cached_arrays`, each key is stored in its own file, because `key` is a digest of everything the arrays
+    are computed from (see `array_digest`). Entries that are no longer used are removed with `prune_store`. If
+    `store_path` is None, then `fn()` is always called.
+    """
+    if store_path is None:
+        return fn()
+
+    filename = Path(store_path) / f"{key}.npz"
+
+    if filename.exists():
+        with np.load(filename) as npz:
+            return {k: npz[k] for k in npz.files}
+
+    arrays = fn()
+
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(filename, lambda f: np.savez(f, **arrays))
+
+    return arrays
+
+
+def prune_store(store_path: Path, keys) -> int:
+    """Removes the entries of a store (see `stored_arrays`) that aren't in `keys`, and returns how many were removed"""
+    keys = set(keys)
+    removed = 0
+
+    for filename in Path(store_path).glob("*.npz"):
+        if filename.stem not in keys:
+            filename.unlink(missing_ok=True)
+            removed += 1
+
+    return removed
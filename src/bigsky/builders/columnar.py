@@ -0,0 +1,141 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = ("numpy", "parquet", "feather")
+"""Columnar output formats. Parquet and Feather require pyarrow."""
+
+TYPES = ("float32", "int32", "string", "category")
+"""
+Column types of the columnar formats:
+
+- float32: missing values are NaN (null in Arrow)
+- int32: missing values are 0 (null in Arrow)
+- string: UTF-8 strings, missing values are empty strings (null in Arrow)
+- category: dictionary-encoded strings, stored as int16 codes into a list of categories (-1 for missing values)
+"""
+
+
+def extension(fmt: str) -> str:
+    return {"numpy": "", "parquet": ".parquet", "feather": ".feather"}[fmt]
+
+
+def require_pyarrow(fmt: str):
+    if pa is None:
+        raise RuntimeError(
+            f"pyarrow is required for the {fmt} format (pip install pyarrow)"
+        )
+
+
+def categorize(values: np.ndarray) -> tuple[np.ndarray, list[str]]:
+    """Dictionary-encodes an array of strings, returning int16 codes (-1 for empty strings) and the categories"""
+    categories, codes = np.unique(values, return_inverse=True)
+    codes = codes.astype(np.int16)
+
+    if len(categories) and categories[0] == "":
+        categories = categories[1:]
+        codes -= 1
+
+    return codes, [str(c) for c in categories]
+
+
+def write_numpy(path: Path, columns: dict, types: dict, meta: dict = None):
+    """
+    Writes columns to a directory with one .npy file per column, which can be memory-mapped when read.
+
+    The directory also has a meta.json file with the type of each column (see `TYPES`) and the categories of
+    dictionary-encoded columns.
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    count = len(next(iter(columns.values()))) if columns else 0
+    meta = dict(meta or {}, count=count, columns={})
+
+    for name, values in columns.items():
+        column_type = types[name]
+        column_meta = {"type": column_type}
+
+        if column_type == "float32":
+            array = np.asarray(values, dtype=np.float32)
+        elif column_type == "int32":
+            array = np.asarray(values, dtype=np.int32)
+        elif column_type == "string":
+            array = np.char.encode(np.asarray(values, dtype=str), "utf-8")
+        elif column_type == "category":
+            array, column_meta["categories"] = categorize(np.asarray(values, dtype=str))
+        else:
+            raise ValueError(f"Unknown column type: {column_type}")
+
+        np.save(path / f"{name}.npy", array)
+        meta["columns"][name] = column_meta
+
+    with open(path / "meta.json", "w") as outfile:
+        json.dump(meta, outfile, indent=2, ensure_ascii=False)
+
+
+def arrow_table(columns: dict, types: dict, meta: dict = None):
+    """Returns the columns as an Arrow table, with nullable types and dictionary-encoded categories"""
+    require_pyarrow("arrow")
+    arrays = {}
+
+    for name, values in columns.items():
+        column_type = types[name]
+
+        if column_type == "float32":
+            arrays[name] = pa.array(
+                np.asarray(values, dtype=np.float32), from_pandas=True
+            )
+        elif column_type == "int32":
+            values = np.asarray(values, dtype=np.int32)
+            arrays[name] = pa.array(values, mask=values == 0)
+        elif column_type == "string":
+            values = np.asarray(values, dtype=str)
+            arrays[name] = pa.array(values, type=pa.string(), mask=values == "")
+        elif column_type == "category":
+            codes, categories = categorize(np.asarray(values, dtype=str))
+            arrays[name] = pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes < 0),
+                pa.array(categories, type=pa.string()),
+            )
+        else:
+            raise ValueError(f"Unknown column type: {column_type}")
+
+    table = pa.table(arrays)
+
+    if meta:
+        table = table.replace_schema_metadata(
+            {k: json.dumps(v) for k, v in meta.items()}
+        )
+
+    return table
+
+
+def write(
+    filename: Path, fmt: str, columns: dict, types: dict, meta: dict = None
+) -> Path:
+    """Writes columns in a columnar format (see `FORMATS`), and returns the filename written"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    filename = Path(str(filename) + extension(fmt))
+
+    if fmt == "numpy":
+        write_numpy(filename, columns, types, meta)
+    elif fmt == "parquet":
+        require_pyarrow(fmt)
+        pq.write_table(arrow_table(columns, types, meta), filename)
+    elif fmt == "feather":
+        require_pyarrow(fmt)
+        # uncompressed, so the file can be memory-mapped
+        feather.write_feather(
+            arrow_table(columns, types, meta), filename, compression="uncompressed"
+        )
+
+    return filename
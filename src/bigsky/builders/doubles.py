@@ -0,0 +1,156 @@
+import csv
+import json
+import logging
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from bigsky import __version__ as VERSION
+from bigsky.catalog import Catalog
+from bigsky.crossmatch import crossmatch
+from bigsky.builders import columnar
+from bigsky.builders.stars import DATA_PATH, BUILD_PATH
+from bigsky.loaders.utils import unique
+from bigsky.loaders.wds import CROSSMATCH_RADIUS, wds_id, wds_lines, wds_rows
+
+logger = logging.getLogger("bigsky")
+
+FORMATS = ("csv",) + columnar.FORMATS
+
+COLUMN_TYPES = {
+    "wds_id": "string",
+    "ra_degrees_j2000": "float32",
+    "dec_degrees_j2000": "float32",
+    "tyc_id": "string",
+    "hip_id": "int32",
+    "separation_arcsec": "float32",
+}
+"""
+Types of the double star columns in the columnar formats (see `bigsky.builders.columnar.TYPES`). `tyc_id` and
+`hip_id` are the ids of the nearest star of the star catalog, and `separation_arcsec` is its distance from the
+double star.
+"""
+
+
+def load_double_stars(data_path: Path = DATA_PATH) -> dict:
+    """Returns the WDS ids and positions (in degrees) of the WDS double stars"""
+    lines = unique(wds_lines(data_path), wds_id, Counter())
+    rows = list(wds_rows(lines, Counter()))
+
+    return {
+        "wds_id": np.array([r["wds_id"] for r in rows], dtype=str),
+        "ra_degrees_j2000": np.array([r["ra"] for r in rows], dtype=float) * 15,
+        "dec_degrees_j2000": np.array([r["dec"] for r in rows], dtype=float),
+    }
+
+
+def link_stars(doubles: dict, stars: Catalog, radius: float) -> dict:
+    """Returns the double star columns with the ids of the nearest star within `radius` arcseconds of each"""
+    count = len(doubles["wds_id"])
+    doubles_index, stars_index, separations = crossmatch(
+        doubles["ra_degrees_j2000"],
+        doubles["dec_degrees_j2000"],
+        stars.ra,
+        stars.dec,
+        radius / 3600,
+    )
+
+    tyc_id = np.full(count, "", dtype=object)
+    hip_id = np.zeros(count, dtype=np.int64)
+    separation_arcsec = np.full(count, np.nan)
+
+    tyc_id[doubles_index] = stars.decode("tyc_id", stars_index)
+    hip_id[doubles_index] = stars.hip_id[stars_index]
+    separation_arcsec[doubles_index] = separations * 3600
+
+    return dict(
+        doubles,
+        tyc_id=tyc_id.astype(str),
+        hip_id=hip_id,
+        separation_arcsec=separation_arcsec,
+    )
+
+
+def write_csv(filename: Path, columns: dict):
+    values = [
+        (
+            ["" if v != v else round(v, 4) for v in columns[name].tolist()]
+            if COLUMN_TYPES[name] == "float32"
+            else [v or "" for v in columns[name].tolist()]
+        )
+        for name in COLUMN_TYPES
+    ]
+
+    with open(filename, "w", newline="") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(COLUMN_TYPES.keys())
+        writer.writerows(zip(*values))
+
+
+def build(
+    data_path: Path = DATA_PATH,
+    build_path: Path = BUILD_PATH,
+    radius: float = CROSSMATCH_RADIUS,
+    formats=FORMATS,
+) -> dict:
+    """
+    Builds the double star catalog files, with each WDS double star cross-matched to the nearest star within
+    `radius` arcseconds, and returns a summary of the build's performance.
+
+    Stars are read from the star catalog in `build_path` (in the NumPy format), so build the stars first.
+    """
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt}")
+        if fmt in ("parquet", "feather"):
+            columnar.require_pyarrow(fmt)
+
+    start = time.perf_counter()
+    timings = {}
+    build_path = Path(build_path)
+    stars_path = build_path / f"bigsky.{VERSION}.stars"
+
+    if not (stars_path / "meta.json").exists():
+        raise FileNotFoundError(
+            f"Star catalog not found: {stars_path} (build the stars in the numpy format first)"
+        )
+
+    parse_start = time.perf_counter()
+    doubles = load_double_stars(data_path)
+    timings["parse"] = time.perf_counter() - parse_start
+
+    crossmatch_start = time.perf_counter()
+    columns = link_stars(doubles, Catalog(stars_path), radius)
+    timings["crossmatch"] = time.perf_counter() - crossmatch_start
+
+    for fmt in formats:
+        write_start = time.perf_counter()
+        filename = build_path / f"bigsky.{VERSION}.doubles"
+
+        if fmt == "csv":
+            write_csv(Path(f"{filename}.csv"), columns)
+        else:
+            columnar.write(
+                filename, fmt, columns, COLUMN_TYPES, meta={"version": VERSION}
+            )
+
+        timings[fmt] = time.perf_counter() - write_start
+
+    linked = int((~np.isnan(columns["separation_arcsec"])).sum())
+    metrics = dict(
+        version=VERSION,
+        rows=len(columns["wds_id"]),
+        linked=linked,
+        radius_arcsec=radius,
+        stages={name: dict(seconds=round(s, 3)) for name, s in timings.items()},
+        seconds=round(time.perf_counter() - start, 3),
+    )
+
+    logger.info(f"Linked {linked} of {metrics['rows']} double stars to stars")
+
+    with open(build_path / f"bigsky.{VERSION}.doubles.metrics.json", "w") as outfile:
+        json.dump(metrics, outfile, indent=2)
+
+    return metrics
@@ -0,0 +1,211 @@
+import csv
+import json
+import logging
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bigsky import __version__ as VERSION
+from bigsky.skyindex import SkyIndex
+from bigsky.tiling import Tiling
+from bigsky.builders import columnar
+from bigsky.builders.stars import DATA_PATH, BUILD_PATH
+
+logger = logging.getLogger("bigsky")
+
+ONGC_FILENAMES = ("NGC.csv", "addendum.csv")
+
+FORMATS = columnar.FORMATS
+
+COLUMN_TYPES = {
+    "name": "string",
+    "type": "category",
+    "ra_degrees_j2000": "float32",
+    "dec_degrees_j2000": "float32",
+    "constellation": "category",
+    "magnitude": "float32",
+    "magnitude_b": "float32",
+    "magnitude_v": "float32",
+    "major_ax": "float32",
+    "minor_ax": "float32",
+    "pos_angle": "float32",
+    "m": "int32",
+    "ngc": "int32",
+    "ic": "int32",
+    "common_names": "string",
+}
+"""
+Types of the deep sky object columns in the columnar formats (see `bigsky.builders.columnar.TYPES`). The
+`magnitude` is the V magnitude, or the B magnitude for objects without a V magnitude.
+"""
+
+
+def read_ongc(filename: Path) -> dict:
+    """Returns the columns of an OpenNGC CSV file as arrays of (stripped) strings, by column name"""
+    with open(filename, "r", newline="") as infile:
+        reader = csv.reader(infile, delimiter=";")
+        header = next(reader)
+        rows = [(row + [""] * len(header))[: len(header)] for row in reader if row]
+
+    values = np.array(rows, dtype=str).reshape(len(rows), len(header))
+    return {name: np.char.strip(values[:, i]) for i, name in enumerate(header)}
+
+
+def to_floats(values: np.ndarray) -> np.ndarray:
+    """Returns an array of strings as floats, with NaN for empty strings"""
+    return np.where(values == "", "nan", values).astype(float)
+
+
+def to_ints(values: np.ndarray) -> np.ndarray:
+    """
+    Returns an array of strings as integers, with 0 for empty strings. Only the first of comma-separated values
+    (e.g. "0224,0225") is used.
+    """
+    first = np.char.partition(values, ",")[..., 0]
+    return np.where(first == "", "0", first).astype(np.int64)
+
+
+def sexagesimal(values: np.ndarray) -> np.ndarray:
+    """
+    Returns an array of sexagesimal strings (e.g. "05:35:16.26" or "-05:23:16.4") as decimal values, with NaN
+    for empty strings
+    """
+    values = np.char.strip(np.asarray(values, dtype=str))
+    negative = np.char.startswith(values, "-")
+    first = np.char.partition(np.char.lstrip(values, "+-"), ":")
+    second = np.char.partition(first[..., 2], ":")
+
+    result = (
+        to_floats(first[..., 0])
+        + to_floats(np.where(second[..., 0] == "", "0", second[..., 0])) / 60
+        + to_floats(np.where(second[..., 2] == "", "0", second[..., 2])) / 3600
+    )
+    return np.where(negative, -result, result)
+
+
+DESIGNATION = re.compile(r"^(NGC|IC)(\d+)")
+
+
+def designation_numbers(names: np.ndarray, catalog: str) -> np.ndarray:
+    """Returns the number of each designation in an NGC or IC `catalog` (e.g. 224 for "NGC0224"), or 0"""
+    numbers = np.zeros(len(names), dtype=np.int64)
+
+    for i, name in enumerate(names.tolist()):
+        match = DESIGNATION.match(name)
+        if match and match.group(1) == catalog:
+            numbers[i] = int(match.group(2))
+
+    return numbers
+
+
+def ongc_columns(values: dict) -> dict:
+    """
+    Returns the typed columns (see `COLUMN_TYPES`) of the string columns of OpenNGC files. NGC and IC numbers are
+    the object's own designation when it's in that catalog, or else the cross-identification in the NGC or IC
+    column.
+    """
+    names = values["Name"]
+    magnitude_b = to_floats(values["B-Mag"])
+    magnitude_v = to_floats(values["V-Mag"])
+    ngc = designation_numbers(names, "NGC")
+    ic = designation_numbers(names, "IC")
+
+    return {
+        "name": names,
+        "type": values["Type"],
+        "ra_degrees_j2000": sexagesimal(values["RA"]) * 15,
+        "dec_degrees_j2000": sexagesimal(values["Dec"]),
+        "constellation": np.char.lower(values["Const"]),
+        "magnitude": np.where(np.isnan(magnitude_v), magnitude_b, magnitude_v),
+        "magnitude_b": magnitude_b,
+        "magnitude_v": magnitude_v,
+        "major_ax": to_floats(values["MajAx"]),
+        "minor_ax": to_floats(values["MinAx"]),
+        "pos_angle": to_floats(values["PosAng"]),
+        "m": to_ints(values["M"]),
+        "ngc": np.where(ngc > 0, ngc, to_ints(values["NGC"])),
+        "ic": np.where(ic > 0, ic, to_ints(values["IC"])),
+        "common_names": values["Common names"],
+    }
+
+
+def load_dsos(data_path: Path = DATA_PATH) -> dict:
+    """Returns the columns of all the OpenNGC objects that have a position"""
+    parts = [
+        ongc_columns(read_ongc(Path(data_path) / "ongc" / filename))
+        for filename in ONGC_FILENAMES
+    ]
+    columns = {name: np.concatenate([p[name] for p in parts]) for name in COLUMN_TYPES}
+    has_position = ~np.isnan(columns["ra_degrees_j2000"]) & ~np.isnan(
+        columns["dec_degrees_j2000"]
+    )
+
+    return {name: values[has_position] for name, values in columns.items()}
+
+
+def build(
+    data_path: Path = DATA_PATH, build_path: Path = BUILD_PATH, formats=FORMATS
+) -> dict:
+    """
+    Builds the deep sky object catalog files in each of the `formats` of `bigsky.builders.columnar`, and returns a
+    summary of the build's performance.
+
+    Like the star catalog, objects are sorted by sky tile and then magnitude, for fast cone searches (see
+    `bigsky.catalog.Catalog`).
+    """
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt}")
+        if fmt in ("parquet", "feather"):
+            columnar.require_pyarrow(fmt)
+
+    start = time.perf_counter()
+    timings = {}
+    build_path = Path(build_path)
+    build_path.mkdir(parents=True, exist_ok=True)
+
+    parse_start = time.perf_counter()
+    columns = load_dsos(data_path)
+    timings["parse"] = time.perf_counter() - parse_start
+
+    tile_start = time.perf_counter()
+    tiling = Tiling()
+    order, tile_offsets = tiling.sort(
+        columns["ra_degrees_j2000"],
+        columns["dec_degrees_j2000"],
+        columns["magnitude"],
+    )
+    columns = {name: values[order] for name, values in columns.items()}
+    timings["tiles"] = time.perf_counter() - tile_start
+
+    for fmt in formats:
+        write_start = time.perf_counter()
+        filename = columnar.write(
+            build_path / f"bigsky.{VERSION}.dsos",
+            fmt,
+            columns,
+            COLUMN_TYPES,
+            meta={"version": VERSION, "tiling": tiling.to_dict()},
+        )
+        if fmt == "numpy":
+            np.save(filename / "tiles.npy", tile_offsets)
+            SkyIndex.build(
+                columns["ra_degrees_j2000"], columns["dec_degrees_j2000"]
+            ).save(filename / "index")
+        timings[fmt] = time.perf_counter() - write_start
+
+    metrics = dict(
+        version=VERSION,
+        rows=len(order),
+        stages={name: dict(seconds=round(s, 3)) for name, s in timings.items()},
+        seconds=round(time.perf_counter() - start, 3),
+    )
+
+    logger.info(f"Parsed {metrics['rows']} deep sky objects")
+
+    with open(build_path / f"bigsky.{VERSION}.dsos.metrics.json", "w") as outfile:
+        json.dump(metrics, outfile, indent=2)
+
+    return metrics
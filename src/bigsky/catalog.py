@@ -0,0 +1,175 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from bigsky.skyindex import SkyIndex
+from bigsky.tiling import Tiling, separation
+
+ALIASES = {
+    "ra": "ra_degrees_j2000",
+    "dec": "dec_degrees_j2000",
+}
+"""Short names of star catalog columns"""
+
+
+class Catalog:
+    """
+    A built catalog in the NumPy format (see `bigsky.builders.columnar.write_numpy`).
+
+    Columns are memory-mapped when first accessed, so opening a catalog only reads its meta.json file, and reading
+    a column only reads the pages that are actually touched. Columns are read-only NumPy views of the files:
+
+    >>> stars = Catalog("build/bigsky.0.4.0.stars")
+    >>> bright = stars.magnitude < 6
+    >>> stars.ra[bright]
+
+    Missing values are NaN in float columns, 0 in integer columns and empty in string columns. Dictionary-encoded
+    columns (e.g. `constellation`) are int16 codes into the column's categories (-1 for missing values), and can be
+    decoded with `decode`.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._columns = {}
+
+        with open(self.path / "meta.json", "r") as infile:
+            self.meta = json.load(infile)
+
+    def __repr__(self):
+        return f"Catalog('{self.path}', count={len(self)})"
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.column(name)
+
+    @property
+    def version(self) -> str:
+        return self.meta.get("version")
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.meta["columns"].keys())
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a memory-mapped column by name (or alias, e.g. `ra`)"""
+        if name not in self.meta["columns"]:
+            name = ALIASES.get(name, name)
+
+        if name not in self.meta["columns"]:
+            raise KeyError(f"Unknown column: {name}")
+
+        if name not in self._columns:
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+
+        return self._columns[name]
+
+    def categories(self, name: str) -> list[str]:
+        """Returns the categories of a dictionary-encoded column"""
+        return self.meta["columns"][ALIASES.get(name, name)]["categories"]
+
+    def decode(self, name: str, index=None) -> np.ndarray:
+        """
+        Returns the values of a string or dictionary-encoded column as an array of strings (missing values are empty
+        strings). Unlike columns, this creates a new array, so use `index` to decode only the rows needed.
+        """
+        values = self.column(name)
+
+        if index is not None:
+            values = values[index]
+
+        column_type = self.meta["columns"][ALIASES.get(name, name)]["type"]
+
+        if column_type == "string":
+            return np.char.decode(values, "utf-8")
+
+        if column_type == "category":
+            categories = np.array(self.categories(name) + [""])
+            return categories[values]  # code -1 is the last element: ""
+
+        raise ValueError(f"Column is not a string column: {name}")
+
+    @property
+    def tiling(self) -> Tiling:
+        """Sky tiling of the catalog, or None if the catalog isn't sorted by tile"""
+        if "tiling" not in self.meta:
+            return None
+        return Tiling(**self.meta["tiling"])
+
+    def tile_offsets(self) -> np.ndarray:
+        """Offsets of each sky tile in the catalog: tile `t` is rows `[offsets[t], offsets[t + 1])`"""
+        if "tiles" not in self._columns:
+            self._columns["tiles"] = np.load(self.path / "tiles.npy", mmap_mode="r")
+        return self._columns["tiles"]
+
+    def sky_index(self) -> SkyIndex:
+        """
+        Returns the catalog's memory-mapped index for nearest neighbour and radius queries (see
+        `bigsky.skyindex.SkyIndex`), which returns catalog rows. Returns None if the catalog has no index.
+        """
+        if not (self.path / "index").exists():
+            return None
+
+        if "index" not in self._columns:
+            self._columns["index"] = SkyIndex.load(self.path / "index")
+
+        return self._columns["index"]
+
+    def cone_search(
+        self, ra: float, dec: float, radius: float, mag_limit: float = None
+    ) -> np.ndarray:
+        """
+        Returns the (sorted) indices of the rows within `radius` degrees of a position in degrees, optionally only
+        including rows with a magnitude of `mag_limit` or brighter.
+
+        Only the tiles that overlap the cone are read. Within each tile, rows are sorted by magnitude, so reading
+        a tile stops at the first row fainter than `mag_limit`.
+        """
+        tiling = self.tiling
+
+        if tiling is None:
+            raise ValueError("Catalog is not sorted by sky tile")
+
+        offsets = self.tile_offsets()
+        ranges = []
+
+        for tile in tiling.tiles_in_cone(ra, dec, radius):
+            start, stop = int(offsets[tile]), int(offsets[tile + 1])
+
+            if mag_limit is not None:
+                stop = start + int(
+                    np.searchsorted(self.magnitude[start:stop], mag_limit, side="right")
+                )
+
+            if stop > start:
+                ranges.append(np.arange(start, stop))
+
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+
+        index = np.concatenate(ranges)
+        inside = separation(ra, dec, self.ra[index], self.dec[index]) <= radius
+
+        return np.sort(index[inside])
+
+    @property
+    def ra(self) -> np.ndarray:
+        return self.column("ra")
+
+    @property
+    def dec(self) -> np.ndarray:
+        return self.column("dec")
+
+    @property
+    def magnitude(self) -> np.ndarray:
+        return self.column("magnitude")
+
+    @property
+    def hip_id(self) -> np.ndarray:
+        return self.column("hip_id")
+
+    @property
+    def constellation(self) -> np.ndarray:
+        return self.column("constellation")
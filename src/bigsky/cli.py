@@ -0,0 +1,173 @@
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from bigsky.builders import doubles, dsos, stars
+
+
+def build_stars(args):
+    metrics = stars.build(
+        data_path=args.data,
+        build_path=args.output,
+        stages=args.stages,
+        workers=args.workers,
+        cache=args.cache,
+        formats=args.formats,
+        magnitude_tiers=args.magnitude_tiers,
+    )
+
+    print(json.dumps(metrics, indent=2))
+
+
+def build_dsos(args):
+    metrics = dsos.build(
+        data_path=args.data,
+        build_path=args.output,
+        formats=args.formats,
+    )
+
+    print(json.dumps(metrics, indent=2))
+
+
+def build_doubles(args):
+    metrics = doubles.build(
+        data_path=args.data,
+        build_path=args.output,
+        radius=args.radius,
+        formats=args.formats,
+    )
+
+    print(json.dumps(metrics, indent=2))
+
+
+def choices_list(choices: tuple[str]):
+    """Returns an argparse type for comma-separated values of `choices`"""
+
+    def parse(value: str) -> list[str]:
+        values = [v.strip() for v in value.split(",") if v.strip()]
+
+        for v in values:
+            if v not in choices:
+                raise argparse.ArgumentTypeError(
+                    f"unknown value '{v}' (choose from: {', '.join(choices)})"
+                )
+
+        return values
+
+    return parse
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="bigsky")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build catalog files")
+    catalogs = build.add_subparsers(dest="catalog", required=True)
+
+    stars_parser = catalogs.add_parser("stars", help="Build the star catalog")
+    stars_parser.add_argument(
+        "--stages",
+        type=choices_list(stars.STAGES),
+        default=list(stars.STAGES),
+        help=f"Comma-separated stages to run (default: {','.join(stars.STAGES)})",
+    )
+    stars_parser.add_argument(
+        "--formats",
+        type=choices_list(stars.FORMATS),
+        default=list(stars.FORMATS),
+        help=f"Comma-separated output formats (default: {','.join(stars.FORMATS)})",
+    )
+    stars_parser.add_argument(
+        "--magnitude-tiers",
+        type=lambda value: [float(v) for v in value.split(",") if v.strip()],
+        default=list(stars.MAGNITUDE_TIERS),
+        help="Comma-separated magnitude limits of the CSV tier files "
+        f"(default: {','.join(str(m) for m in stars.MAGNITUDE_TIERS)})",
+    )
+    stars_parser.add_argument(
+        "--data",
+        type=Path,
+        default=stars.DATA_PATH,
+        help="Path of the raw data (default: %(default)s)",
+    )
+    stars_parser.add_argument(
+        "--output",
+        type=Path,
+        default=stars.BUILD_PATH,
+        help="Path to write the catalog files to (default: %(default)s)",
+    )
+    stars_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes to build shards in (default: %(default)s)",
+    )
+    stars_parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Build everything again, instead of loading reference tables and unchanged shards from the cache",
+    )
+    stars_parser.set_defaults(func=build_stars)
+
+    dsos_parser = catalogs.add_parser(
+        "dsos", help="Build the deep sky object catalog (from OpenNGC)"
+    )
+    dsos_parser.add_argument(
+        "--formats",
+        type=choices_list(dsos.FORMATS),
+        default=list(dsos.FORMATS),
+        help=f"Comma-separated output formats (default: {','.join(dsos.FORMATS)})",
+    )
+    dsos_parser.add_argument(
+        "--data",
+        type=Path,
+        default=dsos.DATA_PATH,
+        help="Path of the raw data (default: %(default)s)",
+    )
+    dsos_parser.add_argument(
+        "--output",
+        type=Path,
+        default=dsos.BUILD_PATH,
+        help="Path to write the catalog files to (default: %(default)s)",
+    )
+    dsos_parser.set_defaults(func=build_dsos)
+
+    doubles_parser = catalogs.add_parser(
+        "doubles",
+        help="Build the double star catalog (from WDS), cross-matched with the star catalog",
+    )
+    doubles_parser.add_argument(
+        "--radius",
+        type=float,
+        default=doubles.CROSSMATCH_RADIUS,
+        help="Cross-match radius in arcseconds (default: %(default)s)",
+    )
+    doubles_parser.add_argument(
+        "--formats",
+        type=choices_list(doubles.FORMATS),
+        default=list(doubles.FORMATS),
+        help=f"Comma-separated output formats (default: {','.join(doubles.FORMATS)})",
+    )
+    doubles_parser.add_argument(
+        "--data",
+        type=Path,
+        default=doubles.DATA_PATH,
+        help="Path of the raw data (default: %(default)s)",
+    )
+    doubles_parser.add_argument(
+        "--output",
+        type=Path,
+        default=doubles.BUILD_PATH,
+        help="Path of the star catalog, and to write the catalog files to (default: %(default)s)",
+    )
+    doubles_parser.set_defaults(func=build_doubles)
+
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    args = parser().parse_args(argv)
+    args.func(args)
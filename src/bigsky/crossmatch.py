@@ -0,0 +1,16 @@
+from bigsky.skyindex import SkyIndex
+
+
+def crossmatch(ra1, dec1, ra2, dec2, radius: float) -> tuple:
+    """
+    Returns the nearest position of the second set within `radius` of each position of the first set, with all
+    values in degrees.
+
+    The result is three arrays: the indices of the positions of the first set that have a match, the indices of
+    their matches in the second set, and the separations of the matches.
+
+    The second set is indexed in declination bands of height `radius` (see `bigsky.skyindex.SkyIndex`), so the
+    candidates of each position are found with binary searches in its band and the bands above and below it.
+    Nothing is compared pairwise, so this takes O((N + M) log M) time for N and M positions.
+    """
+    return SkyIndex.build(ra2, dec2, band=radius).nearest(ra1, dec1, radius)
@@ -1,10 +1,16 @@
 import csv
+from collections import Counter
 from pathlib import Path
 
 from peewee import *
 
-from bigsky.models import db, DeepSkyObject
-from bigsky.loaders.utils import parse_float, chunker
+from bigsky.models import DeepSkyObject
+from bigsky.loaders.utils import (
+    parse_float,
+    parse_sexagesimal,
+    assign_tiles,
+    bulk_load,
+)
 
 filenames = [
     "NGC.csv",
@@ -13,11 +19,8 @@ filenames = [
 
 
 def ra_dec_to_float(ra, dec):
-    ra_h, ra_m, ra_s = [float(d) for d in ra.split(":")]
-    dec_d, dec_m, dec_s = [float(d) for d in dec.split(":")]
-
-    dec_f = dec_d + (dec_m / 60) + (dec_s / 3600)
-    ra_f = ra_h + (ra_m / 60) + (ra_s / 3600)
+    ra_f = parse_sexagesimal(ra, ":")
+    dec_f = parse_sexagesimal(dec, ":")
 
     return round(ra_f, 6), round(dec_f, 6)
 
@@ -30,16 +33,8 @@ def parse_int(value):
         return None
 
 
-def load_ongc(datapath: str):
-    count = 0
-    errors = 0
-    dsos = []
-    parsed = {
-        "m": set(),
-        "ic": set(),
-        "ngc": set(),
-    }
-
+def ongc_rows(datapath: str, stats: Counter):
+    """Yields the OpenNGC objects as rows of `DeepSkyObject` fields, counting rows and errors in `stats`"""
     for filename in filenames:
         with open(Path(datapath) / "ongc" / filename, "r") as infile:
             reader = csv.DictReader(infile, delimiter=";")
@@ -58,34 +53,41 @@ def load_ongc(datapath: str):
                         ngc = int(desig[3:])
                         ic = parse_int(row.get("IC"))
                     else:
-                        print(f"Unknown desig: {desig}")
-
-                    dsos.append(
-                        dict(
-                            name=names,
-                            ra=ra,
-                            dec=dec,
-                            type=row.get("Type"),
-                            magnitude_bt=parse_float(row.get("B-Mag"), r=2),
-                            magnitude_vt=parse_float(row.get("V-Mag"), r=2),
-                            ic=ic,
-                            ngc=ngc,
-                            m=messier,
-                            major_ax=parse_float(row.get("MajAx"), r=2),
-                            minor_ax=parse_float(row.get("MinAx"), r=2),
-                            pos_angle=parse_float(row.get("PosAng"), r=2),
-                        )
+                        # e.g. Messier or Barnard objects, which can still be cross-identified
+                        ngc = parse_int(row.get("NGC"))
+                        ic = parse_int(row.get("IC"))
+
+                    dso = dict(
+                        name=names,
+                        ra=ra,
+                        dec=dec,
+                        type=row.get("Type"),
+                        magnitude_bt=parse_float(row.get("B-Mag"), r=2),
+                        magnitude_vt=parse_float(row.get("V-Mag"), r=2),
+                        ic=ic,
+                        ngc=ngc,
+                        m=messier,
+                        major_ax=parse_float(row.get("MajAx"), r=2),
+                        minor_ax=parse_float(row.get("MinAx"), r=2),
+                        pos_angle=parse_float(row.get("PosAng"), r=2),
                     )
 
                 except Exception as e:
-                    print(f"Error on row {str(count+1)}")
+                    print(f"Error on row {str(stats['count']+1)}")
                     print(e)
-                    errors += 1
+                    stats["errors"] += 1
+                    dso = None
+
+                stats["count"] += 1
+
+                if dso:
+                    yield dso
 
-                count += 1
 
-            for group in chunker(dsos, 980):
-                with db.atomic():
-                    DeepSkyObject.insert_many(group).execute()
+def load_ongc(datapath: str):
+    stats = Counter()
+
+    bulk_load(DeepSkyObject, ongc_rows(datapath, stats))
+    assign_tiles([DeepSkyObject])
 
-    print(f"Total Errors: {str(errors)}")
+    print(f"Total Errors: {str(stats['errors'])}")
@@ -1,15 +1,18 @@
 import sys
 
-from bigsky.loaders.utils import init_db
+from bigsky.loaders.utils import init_db, create_indexes
 from bigsky.loaders.tycho1 import load_tycho_1
 from bigsky.loaders.ongc import load_ongc
+from bigsky.loaders.wds import load_wds, link_double_stars
 
 
 if __name__ == "__main__":
     raw_data_path = sys.argv[1]
     output_filename = sys.argv[2]
 
-    init_db(output_filename)
+    init_db(output_filename, bulk=True)
     load_ongc(raw_data_path)
     load_tycho_1(raw_data_path)
-    # load_wds(raw_data_path)
+    load_wds(raw_data_path)
+    link_double_stars()
+    create_indexes()
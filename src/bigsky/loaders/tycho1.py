@@ -1,12 +1,18 @@
 import csv
 import logging
 
+from collections import Counter
 from pathlib import Path
 
 from peewee import *
 
-from bigsky.models import db, Star
-from bigsky.loaders.utils import parse_float, chunker
+from bigsky.models import Star
+from bigsky.loaders.utils import (
+    parse_float,
+    parse_sexagesimal,
+    assign_tiles,
+    bulk_load,
+)
 
 ROOT = Path(__file__).resolve().parent.resolve().parent.resolve().parent
 
@@ -15,11 +21,8 @@ logger = logging.getLogger("bigsky")
 
 
 def ra_dec_to_float(ra, dec):
-    ra_h, ra_m, ra_s = [float(d) for d in ra.split(" ")]
-    dec_d, dec_m, dec_s = [float(d) for d in dec.split(" ")]
-
-    dec_f = dec_d + (dec_m / 60) + (dec_s / 3600)
-    ra_f = ra_h + (ra_m / 60) + (ra_s / 3600)
+    ra_f = parse_sexagesimal(ra, " ")
+    dec_f = parse_sexagesimal(dec, " ")
 
     return round(ra_f, 6), round(dec_f, 6)
 
@@ -28,47 +31,45 @@ def parse_float(n, r=4):
     return round(float(n or 0), r)
 
 
-def load_tycho_1(datapath: str):
-    count = 0
-    errors = 0
-    hips = 0
-
+def tycho_1_rows(datapath: str, stats: Counter):
+    """Yields the Tycho-1 stars as rows of `Star` fields, counting stars, HIP ids and errors in `stats`"""
     with open(Path(datapath) / "tycho-1" / "tyc_main.dat", "r") as infile:
         reader = csv.reader(infile, delimiter="|")
 
-        stars = []
-
         for row in reader:
             try:
                 hip = row[31].strip()
                 ra, dec = ra_dec_to_float(row[3], row[4])
                 mag = row[5].strip() or row[34].strip() or row[32].strip()
                 if hip:
-                    hips += 1
-
-                stars.append(
-                    dict(
-                        name=f"star-{str(count)}",
-                        ra=ra,
-                        dec=dec,
-                        magnitude=parse_float(mag, r=2),
-                        hip_id=hip,
-                        bv=parse_float(row[37].strip(), r=2),
-                    )
+                    stats["hips"] += 1
+
+                star = dict(
+                    name=f"star-{str(stats['count'])}",
+                    ra=ra,
+                    dec=dec,
+                    magnitude=parse_float(mag, r=2),
+                    hip_id=hip,
+                    bv=parse_float(row[37].strip(), r=2),
                 )
 
             except Exception as e:
-                print(f"Error on row {str(count+1)}")
+                print(f"Error on row {str(stats['count']+1)}")
                 print(e)
-                errors += 1
+                stats["errors"] += 1
                 raise
 
-            count += 1
+            stats["count"] += 1
+
+            yield star
+
+
+def load_tycho_1(datapath: str):
+    stats = Counter()
 
-        for group in chunker(stars, 980):
-            with db.atomic():
-                Star.insert_many(group).execute()
+    bulk_load(Star, tycho_1_rows(datapath, stats))
+    assign_tiles([Star])
 
-    print(f"Parsed {count} stars")
-    print(f"{hips} hips")
-    print(f"Total Errors: {str(errors)}")
+    print(f"Parsed {stats['count']} stars")
+    print(f"{stats['hips']} hips")
+    print(f"Total Errors: {str(stats['errors'])}")
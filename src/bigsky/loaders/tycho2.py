@@ -1,12 +1,13 @@
 import csv
 import logging
 
+from collections import Counter
 from pathlib import Path
 
 from peewee import *
 
-from bigsky.models import db, Star
-from bigsky.loaders.utils import parse_float, chunker
+from bigsky.models import Star
+from bigsky.loaders.utils import parse_float, assign_tiles, bulk_load
 
 ROOT = Path(__file__).resolve().parent.resolve().parent.resolve().parent
 
@@ -14,10 +15,8 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("bigsky")
 
 
-def load_tycho_2(datapath: str):
-    count = 0
-    errors = 0
-    hips = 0
+def tycho_2_rows(datapath: str, stats: Counter):
+    """Yields the Tycho-2 stars as rows of `Star` fields, counting stars, HIP ids and errors in `stats`"""
     tychos = range(0, 19)
 
     for t in tychos:
@@ -29,38 +28,41 @@ def load_tycho_2(datapath: str):
         with open(Path(datapath) / "tycho-2" / tycho_file, "r") as infile:
             reader = csv.reader(infile, delimiter="|")
 
-            stars = []
             for row in reader:
                 try:
                     hip = row[23].strip()
                     if hip:
-                        hips += 1
+                        stats["hips"] += 1
 
-                    ra = parse_float(row[2].strip())
+                    # RA is in degrees in Tycho-2, but in hours in the database
+                    ra = round(parse_float(row[2].strip(), r=8) / 15, 6)
                     dec = parse_float(row[3].strip())
                     mag = parse_float(row[19].strip() or row[17].strip())
 
-                    stars.append(
-                        dict(
-                            name=f"star-{str(count)}",
-                            ra=ra,
-                            dec=dec,
-                            magnitude=mag,
-                        )
+                    star = dict(
+                        name=f"star-{str(stats['count'])}",
+                        ra=ra,
+                        dec=dec,
+                        magnitude=mag,
                     )
 
                 except Exception as e:
-                    print(f"Error on row {str(count+1)}")
+                    print(f"Error on row {str(stats['count']+1)}")
                     print(e)
-                    errors += 1
+                    stats["errors"] += 1
                     raise
 
-                count += 1
+                stats["count"] += 1
+
+                yield star
+
+
+def load_tycho_2(datapath: str):
+    stats = Counter()
 
-            for group in chunker(stars, 980):
-                with db.atomic():
-                    Star.insert_many(group).execute()
+    bulk_load(Star, tycho_2_rows(datapath, stats))
+    assign_tiles([Star])
 
-    logger.info(f"Parsed {count} stars")
-    logger.info(f"Found {hips} hips")
-    logger.info(f"Total Errors: {str(errors)}")
+    logger.info(f"Parsed {stats['count']} stars")
+    logger.info(f"Found {stats['hips']} hips")
+    logger.info(f"Total Errors: {str(stats['errors'])}")
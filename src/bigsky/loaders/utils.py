@@ -1,18 +1,155 @@
+import logging
+from collections import Counter
+from itertools import chain
+
+import numpy as np
 from peewee import *
 
-from bigsky.models import db, Star, DeepSkyObject, DoubleStar
+from bigsky.models import db, tile_of, Star, DeepSkyObject, DoubleStar
+
+logger = logging.getLogger("bigsky")
+
+MODELS = [Star, DeepSkyObject, DoubleStar]
+
+BULK_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": 0,  # OFF: don't wait for the OS to flush writes to disk
+    "cache_size": -1024 * 256,  # 256 MB (negative values are in KiB)
+    "temp_store": "memory",
+}
+"""
+Pragmas for bulk loading a new database. With synchronous=OFF, the database can be corrupted if the OS crashes
+(but not if the process crashes) during a load, which is fine for a database that's built from scratch.
+"""
 
 
-def init_db(filename: str):
-    db.init(filename, pragmas={"journal_mode": "wal"})
+def init_db(filename: str, bulk: bool = False):
+    """
+    Initializes a new database, dropping any existing tables.
+
+    In bulk mode, the database uses the `BULK_PRAGMAS` and tables are created without their indexes, which are much
+    faster to build once after loading all rows (see `create_indexes`) than to update on every insert.
+    """
+    db.init(filename, pragmas=BULK_PRAGMAS if bulk else {"journal_mode": "wal"})
     db.connect()
-    db.drop_tables([Star, DeepSkyObject, DoubleStar])
-    db.create_tables([Star, DeepSkyObject, DoubleStar])
+    db.drop_tables(MODELS)
+
+    if bulk:
+        for model in MODELS:
+            model._schema.create_table(safe=True)
+    else:
+        db.create_tables(MODELS)
+
+
+def assign_tiles(models: list = MODELS, batch_size: int = 100_000):
+    """
+    Sets the sky tile of all rows without one (see `bigsky.models.TILING`). This is much faster once after a bulk
+    load (and before `create_indexes`) than on every insert, because tiles are calculated for a batch of rows at a
+    time. The `load_*` functions of the loaders call it after loading their rows.
+    """
+    for model in models:
+        table = model._meta.table_name
+        last_id = 0
+
+        with db.atomic():
+            while True:
+                rows = db.execute_sql(
+                    f'SELECT "id", "ra", "dec" FROM "{table}" '
+                    f'WHERE "id" > ? AND "tile" IS NULL ORDER BY "id" LIMIT ?',
+                    (last_id, batch_size),
+                ).fetchall()
+
+                if not rows:
+                    break
+
+                ids = [row[0] for row in rows]
+                ra, dec = np.array([row[1:] for row in rows], dtype=float).T
+                db.cursor().executemany(
+                    f'UPDATE "{table}" SET "tile" = ? WHERE "id" = ?',
+                    zip(tile_of(ra, dec).tolist(), ids),
+                )
+                last_id = ids[-1]
+
+
+def create_indexes(models: list = MODELS):
+    """
+    Creates the indexes of tables created in bulk mode (see `init_db`), and warns about rows without a sky tile,
+    which searches skip (see `assign_tiles`)
+    """
+    with db.atomic():
+        for model in models:
+            model._schema.create_indexes(safe=True)
+
+    for model in models:
+        untiled = model.select().where(model.tile.is_null()).count()
+        if untiled:
+            logger.warning(
+                f"{untiled} {model.__name__} rows have no sky tile, so searches skip them"
+            )
+
+
+def bulk_load(model, rows) -> int:
+    """
+    Inserts rows (dictionaries of field values, which all have the same fields) into a model's table, and returns
+    the number of rows inserted.
+
+    Rows are inserted with a single `executemany` in one transaction, which is much faster than `insert_many` in
+    chunks. `rows` can be a generator, which is consumed as rows are inserted, so the rows never all need to be in
+    memory.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+
+    if first is None:
+        return 0
+
+    fields = [model._meta.fields[name] for name in first]
+    columns = ", ".join(f'"{field.column_name}"' for field in fields)
+    params = ", ".join("?" for _ in fields)
+    sql = f'INSERT INTO "{model._meta.table_name}" ({columns}) VALUES ({params})'
+
+    def values():
+        for row in chain([first], rows):
+            yield tuple(field.db_value(row[field.name]) for field in fields)
+
+    with db.atomic():
+        cursor = db.cursor()
+        cursor.executemany(sql, values())
+        return cursor.rowcount
+
+
+def unique(rows, key, duplicates: Counter):
+    """
+    Yields the rows with a key (`key(row)`) that wasn't in any previous row, and counts the other rows by key in
+    `duplicates`. Seen keys are kept in a set, so this takes linear time.
+    """
+    seen = set()
+
+    for row in rows:
+        k = key(row)
+
+        if k in seen:
+            duplicates[k] += 1
+            continue
+
+        seen.add(k)
+        yield row
 
 
 def parse_float(n, r=4):
     return round(float(n or 0), r)
 
 
+def parse_sexagesimal(value: str, separator: str) -> float:
+    """
+    Returns a sexagesimal string (e.g. "-05 23 16.4" with a " " separator) as a decimal value. The sign applies to
+    the whole value, including values between -1 and 0 (e.g. "-00 30 00").
+    """
+    value = value.strip()
+    degrees, minutes, seconds = [float(d) for d in value.split(separator)]
+    result = abs(degrees) + (minutes / 60) + (seconds / 3600)
+    return -result if value.startswith("-") else result
+
+
 def chunker(seq, size):
     return (seq[pos : pos + size] for pos in range(0, len(seq), size))
@@ -1,11 +1,14 @@
 import logging
 
+from collections import Counter
 from pathlib import Path
 
+import numpy as np
 from peewee import *
 
-from bigsky.models import db, DoubleStar
-from bigsky.loaders.utils import parse_float, chunker
+from bigsky.crossmatch import crossmatch
+from bigsky.models import db, DoubleStar, Star
+from bigsky.loaders.utils import parse_float, assign_tiles, bulk_load, unique
 
 ROOT = Path(__file__).resolve().parent.resolve().parent.resolve().parent
 
@@ -31,61 +34,110 @@ def parse_coords(coord_str: str) -> float:
     return parse_float(a) + parse_float(b) / 60 + parse_float(c) / 3600
 
 
-def load_wds(datapath: str):
-    count = 0
-    errors = 0
-    hips = 0
+def wds_lines(datapath: str):
     filename = "wds_all.txt"
-    wds_ids = []
-    dupes = []
 
     logger.info(filename)
 
     with open(Path(datapath) / "wds" / filename, "r") as infile:
+        yield from infile
 
-        double_stars = []
 
-        for wds in infile:
-            try:
-                wds_id = wds[:17].strip()
+def wds_id(line: str) -> str:
+    return line[:17].strip()
 
-                if wds_id in wds_ids:
-                    # print(f"{wds_id} already parsed, skipping...")
-                    # print(wds_id)
-                    dupes += wds_id
-                    continue
-                else:
-                    wds_ids.append(wds_id)
-                    # continue
 
-                coords = wds[112:129]
-                ra_str = coords[:9].strip()
-                dec_str = coords[9:].strip()
+def wds_rows(lines, stats: Counter):
+    """Yields WDS lines as rows of `DoubleStar` fields, counting rows and errors in `stats`"""
+    for wds in lines:
+        try:
+            coords = wds[112:129]
+            ra_str = coords[:9].strip()
+            dec_str = coords[9:].strip()
 
-                ra = parse_coords(ra_str)
+            ra = parse_coords(ra_str)
 
-                dec = parse_coords(dec_str[1:])
-                if dec_str[0] == "-":
-                    dec *= -1
+            dec = parse_coords(dec_str[1:])
+            if dec_str[0] == "-":
+                dec *= -1
 
-                double_stars.append(
-                    dict(name=f"double-{str(count)}", ra=ra, dec=dec, wds_id=wds_id)
-                )
+            double_star = dict(
+                name=f"double-{str(stats['count'])}",
+                ra=ra,
+                dec=dec,
+                wds_id=wds_id(wds),
+            )
 
-            except Exception as e:
-                print(f"Error on row {str(count+1)}")
-                print(e)
-                errors += 1
-                # raise
+        except Exception as e:
+            print(f"Error on row {str(stats['count']+1)}")
+            print(e)
+            stats["errors"] += 1
+            double_star = None
+            # raise
 
-            count += 1
+        stats["count"] += 1
 
-        # insert records
-        for group in chunker(double_stars, 980):
-            with db.atomic():
-                DoubleStar.insert_many(group).execute()
+        if double_star:
+            yield double_star
 
-    logger.info(f"Parsed {count} double stars")
-    logger.info(f"Found {hips} hips")
-    logger.info(f"Dupes = {len(dupes)}")
-    logger.info(f"Total Errors: {str(errors)}")
+
+def load_wds(datapath: str) -> Counter:
+    """
+    Loads the WDS double stars, skipping all but the first line of each WDS id (which must be unique in the
+    database). Returns the number of duplicate lines of each duplicated WDS id.
+    """
+    stats = Counter()
+    duplicates = Counter()
+
+    lines = unique(wds_lines(datapath), wds_id, duplicates)
+
+    # insert records
+    bulk_load(DoubleStar, wds_rows(lines, stats))
+    assign_tiles([DoubleStar])
+
+    logger.info(f"Parsed {stats['count']} double stars")
+    logger.info(
+        f"Dupes = {duplicates.total()} lines of {len(duplicates)} WDS ids "
+        f"(most: {', '.join(f'{k} x{v}' for k, v in duplicates.most_common(5))})"
+    )
+    logger.info(f"Total Errors: {str(stats['errors'])}")
+
+    return duplicates
+
+
+CROSSMATCH_RADIUS = 5.0
+"""Default radius (in arcseconds) for cross-matching double stars with stars"""
+
+
+def table_positions(table: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the ids, RA (in degrees) and declination of all rows of a table"""
+    rows = db.execute_sql(f'SELECT "id", "ra", "dec" FROM "{table}"').fetchall()
+    values = np.array(rows, dtype=float).reshape(len(rows), 3)
+    return values[:, 0].astype(np.int64), values[:, 1] * 15, values[:, 2]
+
+
+def link_double_stars(radius: float = CROSSMATCH_RADIUS) -> int:
+    """
+    Links each double star to the nearest star within `radius` arcseconds (`DoubleStar.hip`), and returns the
+    number of double stars linked
+    """
+    doubles_id, doubles_ra, doubles_dec = table_positions(DoubleStar._meta.table_name)
+    stars_id, stars_ra, stars_dec = table_positions(Star._meta.table_name)
+
+    doubles, stars, _ = crossmatch(
+        doubles_ra, doubles_dec, stars_ra, stars_dec, radius / 3600
+    )
+
+    table = DoubleStar._meta.table_name
+    column = DoubleStar.hip.column_name
+
+    with db.atomic():
+        db.execute_sql(f'UPDATE "{table}" SET "{column}" = NULL')
+        db.cursor().executemany(
+            f'UPDATE "{table}" SET "{column}" = ? WHERE "id" = ?',
+            zip(stars_id[stars].tolist(), doubles_id[doubles].tolist()),
+        )
+
+    logger.info(f"Linked {len(doubles)} of {len(doubles_id)} double stars to stars")
+
+    return len(doubles)
@@ -1,31 +1,64 @@
+import operator
+from functools import reduce
+
+import numpy as np
 from peewee import *
 
+from bigsky.tiling import Tiling, separation, tile_ranges
+
 db = SqliteDatabase(None)
 
+TILING = Tiling()
+"""Sky tiling of the `tile` column of all models"""
+
+
+def tile_of(ra, dec) -> np.ndarray:
+    """Returns the `TILING` tile of each position (RA in hours, declination in degrees)"""
+    return TILING.tile(np.asarray(ra, dtype=float) * 15, dec)
+
 
 class BaseModel(Model):
+    """
+    Base of all models. Positions are RA in hours and declination in degrees (J2000), and `tile` is the sky tile of
+    the position (see `TILING`), which is set by the loaders (see `bigsky.loaders.utils.assign_tiles`).
+    """
+
     class Meta:
         database = db
 
+    @classmethod
+    def magnitude_field(cls):
+        """Field used for magnitude limits in searches, or None if the model has no magnitude"""
+        return None
+
 
 class Star(BaseModel):
     name = CharField()
     ra = FloatField(index=False)
     dec = FloatField(index=False)
+    tile = IntegerField(null=True, index=False)
     bayer = CharField(null=True)
-    magnitude = FloatField(index=False)
+    magnitude = FloatField(index=True)
     magnitude_vt = FloatField(null=True, index=False)
     magnitude_bt = FloatField(null=True, index=False)
     bv = FloatField(null=True, index=False)
     hip_id = IntegerField(unique=False, null=True)
 
+    class Meta:
+        indexes = ((("tile", "magnitude"), False),)
+
+    @classmethod
+    def magnitude_field(cls):
+        return cls.magnitude
+
 
 class DeepSkyObject(BaseModel):
     name = CharField()
     ra = FloatField(index=False)
     dec = FloatField(index=False)
+    tile = IntegerField(null=True, index=False)
     type = CharField()
-    magnitude_vt = FloatField(null=True, index=False)
+    magnitude_vt = FloatField(null=True, index=True)
     magnitude_bt = FloatField(null=True, index=False)
     major_ax = FloatField(null=True)
     minor_ax = FloatField(null=True)
@@ -36,10 +69,90 @@ class DeepSkyObject(BaseModel):
     ngc = IntegerField(unique=False, null=True)
     m = IntegerField(unique=False, null=True)
 
+    class Meta:
+        indexes = ((("tile", "magnitude_vt"), False),)
+
+    @classmethod
+    def magnitude_field(cls):
+        return cls.magnitude_vt
+
 
 class DoubleStar(BaseModel):
     name = CharField()
     ra = FloatField(index=False)
     dec = FloatField(index=False)
+    tile = IntegerField(null=True, index=True)
     hip = ForeignKeyField(Star, backref="double_star", null=True)
     wds_id = CharField(unique=True, null=True)
+
+
+def _tiles_query(model, tiles, mag_limit: float = None):
+    ranges = tile_ranges(tiles)
+
+    if not ranges:
+        return model.select().where(SQL("0"))
+
+    query = model.select().where(
+        reduce(operator.or_, (model.tile.between(a, b) for a, b in ranges))
+    )
+
+    if mag_limit is not None:
+        field = model.magnitude_field()
+        if field is None:
+            raise ValueError(f"{model.__name__} has no magnitude")
+        query = query.where(field <= mag_limit)
+
+    return query
+
+
+def cone_search(
+    model, ra: float, dec: float, radius: float, mag_limit: float = None
+) -> list:
+    """
+    Returns the rows of a model within `radius` degrees of a position (RA in hours, declination in degrees),
+    optionally only including rows with a magnitude of `mag_limit` or brighter.
+
+    Only the index ranges of the sky tiles that overlap the cone are read.
+    """
+    query = _tiles_query(
+        model, TILING.tiles_in_cone(ra * 15, dec, radius), mag_limit
+    ).where(model.dec.between(dec - radius, dec + radius))
+    rows = list(query)
+
+    if not rows:
+        return []
+
+    separations = separation(
+        ra * 15,
+        dec,
+        np.array([r.ra for r in rows]) * 15,
+        np.array([r.dec for r in rows]),
+    )
+    return [row for row, sep in zip(rows, separations) if sep <= radius]
+
+
+def box_search(
+    model,
+    ra_min: float,
+    ra_max: float,
+    dec_min: float,
+    dec_max: float,
+    mag_limit: float = None,
+) -> list:
+    """
+    Returns the rows of a model within a box of RA (in hours) and declination (in degrees), optionally only
+    including rows with a magnitude of `mag_limit` or brighter. The box wraps around RA 0 if `ra_min` is greater
+    than `ra_max`.
+    """
+    tiles = TILING.tiles_in_box(ra_min * 15, ra_max * 15, dec_min, dec_max)
+
+    if ra_min <= ra_max:
+        in_ra = model.ra.between(ra_min, ra_max)
+    else:
+        in_ra = (model.ra >= ra_min) | (model.ra <= ra_max)
+
+    return list(
+        _tiles_query(model, tiles, mag_limit).where(
+            in_ra & model.dec.between(dec_min, dec_max)
+        )
+    )
@@ -0,0 +1,97 @@
+import numpy as np
+
+from bigsky.builders.stars import Epoch, earth
+from bigsky.skyindex import unit_vectors
+
+MODES = ("accurate", "fast")
+"""
+Modes of `propagate`:
+
+- accurate: linear motion of each star in space, and the change in its parallax displacement (for stars with a
+  parallax) between the Earth's positions at J2000 and at the epoch. This matches Skyfield's astrometric positions
+  to well under a milliarcsecond. It loads the ephemeris for the Earth's positions, so epochs must be within the
+  ephemeris's range (1900 to 2050) when any of the stars have a parallax.
+- fast: first order proper motion in RA and declination, without parallax. Errors are up to about the parallax of
+  each star (a few milliarcseconds for most stars), plus second order motion errors, which get large near the
+  poles.
+"""
+
+MAS_PER_RADIAN = np.degrees(1) * 3_600_000
+"""Also the distance (in AU) of a star with a parallax of 1 milliarcsecond"""
+
+DAYS_PER_YEAR = 365.25
+
+
+def tangent_vectors(ra, dec) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the unit vectors towards increasing RA (east) and declination (north) at positions in degrees"""
+    ra, dec = np.radians(ra), np.radians(dec)
+    east = np.stack([-np.sin(ra), np.cos(ra), np.zeros_like(ra)], axis=-1)
+    north = np.stack(
+        [-np.sin(dec) * np.cos(ra), -np.sin(dec) * np.sin(ra), np.cos(dec)], axis=-1
+    )
+    return east, north
+
+
+def to_radec(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the RA and declination (in degrees) of an (n, 3) array of vectors"""
+    x, y, z = vectors[:, 0], vectors[:, 1], vectors[:, 2]
+    ra = np.mod(np.degrees(np.arctan2(y, x)), 360)
+    dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    return ra, dec
+
+
+def propagate(
+    catalog, epoch, index=None, mode: str = "accurate"
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the RA and declination (in degrees) of a star catalog's stars at another epoch, by applying their proper
+    motions (and parallaxes, in the accurate mode) to their J2000 positions. See `MODES` for the modes.
+
+    `catalog` is a `bigsky.catalog.Catalog`, or a dictionary of its columns. `epoch` is a year (e.g. 2050.5) or a
+    Skyfield `Time`. Use `index` (e.g. indices or a boolean mask) to propagate only some of the stars.
+
+    All stars are propagated at once, with at most one ephemeris lookup for the Earth's position:
+
+    >>> ra, dec = propagate(stars, 2050, index=stars.magnitude < 6)
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+
+    def column(name):
+        values = catalog[name] if index is None else catalog[name][index]
+        return np.asarray(values, dtype=float)
+
+    time = epoch if hasattr(epoch, "tt") else Epoch.create(float(epoch))
+    years = (time.tt - Epoch.J_2000.tt) / DAYS_PER_YEAR
+
+    ra = column("ra_degrees_j2000")
+    dec = column("dec_degrees_j2000")
+    pm_ra = np.nan_to_num(column("ra_mas_per_year"))
+    pm_dec = np.nan_to_num(column("dec_mas_per_year"))
+
+    if mode == "fast":
+        dec_epoch = dec + pm_dec * years / 3_600_000
+        ra_epoch = ra + pm_ra * years / 3_600_000 / np.cos(np.radians(dec))
+        return np.mod(ra_epoch, 360), np.clip(dec_epoch, -90, 90)
+
+    # Positions are directions u from the Earth at J2000 (see `bigsky.builders.stars.to_j2000`), so a star at
+    # distance d from the barycenter is at d * b, where b = u + earth_j2000 / d (normalized). It moves d * motion
+    # in space (in the tangent plane at b), so its direction from the Earth at the epoch is
+    # b + motion - earth_epoch / d, where 1 / d is proportional to the parallax (and 0 for stars without one).
+    vectors = unit_vectors(ra, dec)
+    parallax = np.nan_to_num(column("parallax_mas"))
+    inverse_distance = np.where(parallax > 0, parallax, 0)[:, None] / MAS_PER_RADIAN
+
+    if inverse_distance.any():
+        vectors += inverse_distance * earth().at(Epoch.J_2000).position.au
+        vectors /= np.linalg.norm(vectors, axis=-1)[:, None]
+
+    east, north = tangent_vectors(*to_radec(vectors))
+    vectors += (
+        (pm_ra[:, None] * east + pm_dec[:, None] * north) * years / MAS_PER_RADIAN
+    )
+
+    if inverse_distance.any():
+        vectors -= inverse_distance * earth().at(time).position.au
+
+    return to_radec(vectors)
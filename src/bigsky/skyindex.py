@@ -0,0 +1,215 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_BAND = 0.25
+"""Default height (in degrees) of the declination bands of a `SkyIndex`"""
+
+ZONES_KEY = 1000
+"""Multiplier of band numbers in the sort keys of positions (band * ZONES_KEY + RA), which must be more than 360"""
+
+
+def unit_vectors(ra, dec) -> np.ndarray:
+    """Returns positions in degrees as an (n, 3) array of unit vectors"""
+    ra, dec = np.radians(ra), np.radians(dec)
+    return np.stack(
+        [np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1
+    )
+
+
+def ra_half_width(dec: np.ndarray, radius: np.ndarray) -> np.ndarray:
+    """Returns the half width in RA (in degrees) of a cone at each declination, or 180 if the cone has a pole"""
+    edge = np.abs(dec) + radius
+    with np.errstate(divide="ignore", invalid="ignore"):
+        width = np.degrees(
+            np.arcsin(np.sin(np.radians(radius)) / np.cos(np.radians(edge)))
+        )
+    return np.where((edge >= 90) | ~(width < 180), 180, width)
+
+
+@dataclass
+class SkyIndex:
+    """
+    Index of positions for nearest neighbour and radius queries, with all values in degrees.
+
+    Positions are sorted into declination bands of `band` degrees, and by RA within each band, so the candidates of
+    a query are found with binary searches in the bands that the query's cone overlaps. Distances are calculated
+    from unit vectors. Queries are batched: they take arrays of positions, and are vectorized over all of them.
+
+    Indices can be saved to a directory (see `save`) and loaded with memory-mapped arrays (see `load`):
+
+    >>> index = SkyIndex.build(stars.ra, stars.dec)
+    >>> rows, separations = index.query_knn([37.95], [89.26], k=5)
+    """
+
+    band: float
+    keys: np.ndarray
+    """Sort key of each position: band * ZONES_KEY + RA"""
+
+    xyz: np.ndarray
+    """Unit vector of each position, in key order"""
+
+    index: np.ndarray
+    """Row of each position (in the arrays the index was built from), in key order"""
+
+    @classmethod
+    def build(cls, ra, dec, band: float = DEFAULT_BAND) -> "SkyIndex":
+        ra = np.mod(np.asarray(ra, dtype=float), 360)
+        dec = np.asarray(dec, dtype=float)
+        keys = cls._bands(band, dec) * ZONES_KEY + ra
+        order = np.argsort(keys, kind="stable")
+        return cls(band, keys[order], unit_vectors(ra[order], dec[order]), order)
+
+    @classmethod
+    def load(cls, path) -> "SkyIndex":
+        """Loads an index saved with `save`, with memory-mapped arrays"""
+        path = Path(path)
+
+        with open(path / "meta.json", "r") as infile:
+            meta = json.load(infile)
+
+        return cls(
+            meta["band"],
+            *(
+                np.load(path / f"{name}.npy", mmap_mode="r")
+                for name in ("keys", "xyz", "index")
+            ),
+        )
+
+    def save(self, path):
+        """Saves the index to a directory, with a .npy file per array"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        for name in ("keys", "xyz", "index"):
+            np.save(path / f"{name}.npy", getattr(self, name))
+
+        with open(path / "meta.json", "w") as outfile:
+            json.dump({"band": self.band, "count": len(self)}, outfile, indent=2)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _bands(band: float, dec) -> np.ndarray:
+        bands = int(np.ceil(180 / band))
+        return np.clip(np.floor((np.asarray(dec) + 90) / band), 0, bands - 1).astype(
+            np.int64
+        )
+
+    def query_radius(self, ra, dec, radius) -> tuple:
+        """
+        Returns all positions within `radius` of each query position. `radius` can be one value, or one per query.
+
+        The result is three arrays, with one element per match, sorted by query and then separation: the index of
+        the query, the row of the matching position and the separation.
+        """
+        ra = np.mod(np.ravel(np.asarray(ra, dtype=float)), 360)
+        dec = np.ravel(np.asarray(dec, dtype=float))
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), ra.shape)
+
+        # each query has up to 3 RA ranges in each band: the cone's range, and where it wraps around RA 0
+        width = ra_half_width(dec, radius)
+        full = width >= 180
+        lo, hi = np.where(full, 0, ra - width), np.where(full, 360, ra + width)
+        ranges = [
+            (np.maximum(lo, 0), np.minimum(hi, 360), np.ones(len(ra), dtype=bool)),
+            (lo + 360, np.full(len(ra), 360.0), lo < 0),
+            (np.zeros(len(ra)), hi - 360, hi > 360),
+        ]
+
+        first_band = self._bands(self.band, dec - radius)
+        last_band = self._bands(self.band, dec + radius)
+        queries, starts, stops = [], [], []
+
+        for offset in range(int((last_band - first_band).max(initial=-1)) + 1):
+            band = first_band + offset
+
+            for range_lo, range_hi, used in ranges:
+                query = np.flatnonzero(used & (band <= last_band))
+                base = band[query] * ZONES_KEY
+                queries.append(query)
+                starts.append(
+                    np.searchsorted(self.keys, base + range_lo[query], "left")
+                )
+                stops.append(
+                    np.searchsorted(self.keys, base + range_hi[query], "right")
+                )
+
+        if not queries:
+            return (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0))
+
+        queries, starts, stops = (np.concatenate(v) for v in (queries, starts, stops))
+        counts = stops - starts
+
+        # one element per candidate
+        queries = np.repeat(queries, counts)
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(
+            counts.sum()
+        )
+        chords = np.linalg.norm(
+            self.xyz[positions] - unit_vectors(ra[queries], dec[queries]), axis=-1
+        )
+        separations = np.degrees(2 * np.arcsin(np.clip(chords / 2, 0, 1)))
+
+        inside = separations <= radius[queries]
+        queries, positions, separations = (
+            queries[inside],
+            positions[inside],
+            separations[inside],
+        )
+        rows = self.index[positions]
+        order = np.lexsort((rows, separations, queries))
+
+        return queries[order], rows[order], separations[order]
+
+    def query_knn(self, ra, dec, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the `k` nearest positions of each query position, as (n, k) arrays of their rows and separations,
+        sorted by separation. If there are fewer than `k` positions in the index, rows are padded with -1 and
+        separations with NaN.
+
+        Queries start with a radius that's expected to have about `2 * k` positions, and the radius is doubled for the
+        queries that have fewer than `k` positions within it.
+        """
+        ra = np.ravel(np.asarray(ra, dtype=float))
+        dec = np.ravel(np.asarray(dec, dtype=float))
+        rows = np.full((len(ra), k), -1, dtype=np.int64)
+        separations = np.full((len(ra), k), np.nan)
+
+        if len(self) == 0:
+            return rows, separations
+
+        sky_area = 4 * np.pi * np.degrees(1) ** 2
+        radius = np.full(
+            len(ra), min(180, np.sqrt(2 * k / len(self) * sky_area / np.pi))
+        )
+        pending = np.arange(len(ra))
+
+        while len(pending):
+            queries, matches, match_separations = self.query_radius(
+                ra[pending], dec[pending], radius[pending]
+            )
+            counts = np.bincount(queries, minlength=len(pending))
+            done = (counts >= k) | (radius[pending] >= 180)
+
+            rank = np.arange(len(queries)) - (np.cumsum(counts) - counts)[queries]
+            keep = done[queries] & (rank < k)
+            rows[pending[queries[keep]], rank[keep]] = matches[keep]
+            separations[pending[queries[keep]], rank[keep]] = match_separations[keep]
+
+            pending = pending[~done]
+            radius[pending] = np.minimum(radius[pending] * 2, 180)
+
+        return rows, separations
+
+    def nearest(self, ra, dec, radius) -> tuple:
+        """
+        Returns the nearest position within `radius` of each query position, as three arrays: the indices of the
+        queries that have a match, and the rows and separations of their matches
+        """
+        queries, rows, separations = self.query_radius(ra, dec, radius)
+        first = np.concatenate([[True], np.diff(queries) != 0])[: len(queries)]
+        return queries[first], rows[first], separations[first]
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from src.bigsky.benchmarks import stars as benchmark
+from src.bigsky.builders import stars
+from src.bigsky.catalog import Catalog
+
+
+def test_write_raw(tmp_path):
+    raw, build = tmp_path / "raw", tmp_path / "build"
+    benchmark.write_raw(raw, 2000)
+
+    metrics = stars.build(raw, build, workers=1, cache=False, formats=["numpy"])
+
+    assert metrics["stages"]["tycho2"]["rows"] == 2000
+    assert metrics["stages"]["suppl"]["rows"] == 20
+    assert metrics["total"]["errors"] == metrics["total"]["no_radec"] == 0
+
+    catalog = Catalog(build / f"bigsky.{stars.VERSION}.stars")
+    hip = catalog["hip_id"] > 0
+
+    assert 100 < hip.sum() < 300
+    assert not np.isnan(catalog["parallax_mas"][hip]).any()
+    assert (catalog["hd_id"][hip] > 0).any()
+
+    stages = benchmark.stage_seconds(metrics)
+    for name in ["references", "parse", "crossmatch", "astrometry", "constellation"]:
+        assert name in stages
+    assert "numpy" in stages and "tycho2" not in stages
+
+
+def test_compare():
+    baseline = {
+        "1000": {"seconds": 1.0, "stages": {"parse": 0.5, "write": 0.01}},
+    }
+    results = {
+        "1000": {"seconds": 1.2, "stages": {"parse": 0.9, "write": 0.04}},
+        "2000": {"seconds": 9.0, "stages": {"parse": 9.0}},
+    }
+
+    assert benchmark.compare(results, baseline) == [
+        "1,000 rows: parse took 0.900 s (baseline 0.500 s)"
+    ]
+    assert benchmark.compare(results, baseline, tolerance=2) == []
+
+
+def test_run():
+    results = benchmark.run([500])
+
+    assert results["500"]["rows"] == 506  # plus the supplement and the extra stars
+    assert benchmark.compare(results, results) == []
+    assert np.isclose(
+        results["500"]["rows_per_second"], 506 / results["500"]["seconds"], rtol=0.01
+    )
+
+
+def test_main_baseline(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+
+    with pytest.raises(SystemExit):
+        benchmark.main(["--scales", "500", "--compare", "--baseline", str(baseline)])
+
+    benchmark.main(["--scales", "500", "--save-baseline", "--baseline", str(baseline)])
+    benchmark.main(["--scales", "500", "--compare", "--baseline", str(baseline)])
+
+    assert "No regressions" in capsys.readouterr().out
+    assert list(benchmark.read_baseline(baseline)) == ["500"]
@@ -0,0 +1,114 @@
+import numpy as np
+
+from src.bigsky.builders.cache import (
+    array_digest,
+    cached,
+    cached_arrays,
+    file_digest,
+    prune_store,
+    stored_arrays,
+)
+
+
+def test_cached(tmp_path):
+    source = tmp_path / "source.dat"
+    source.write_text("hello")
+    cache_path = tmp_path / "cache"
+    calls = []
+
+    def load():
+        calls.append(1)
+        return {"value": source.read_text()}
+
+    assert cached("test", [source], load, cache_path) == {"value": "hello"}
+    assert cached("test", [source], load, cache_path) == {"value": "hello"}
+    assert len(calls) == 1
+
+    source.write_text("hello world")
+
+    assert cached("test", [source], load, cache_path) == {"value": "hello world"}
+    assert len(calls) == 2
+    assert len(list(cache_path.glob("test.*.pickle"))) == 1
+
+
+def test_cached_disabled(tmp_path):
+    source = tmp_path / "source.dat"
+    source.write_text("hello")
+    calls = []
+
+    def load():
+        calls.append(1)
+        return 42
+
+    assert cached("test", [source], load, None) == 42
+    assert cached("test", [source], load, None) == 42
+    assert len(calls) == 2
+
+
+def test_cached_arrays(tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"a": np.arange(3), "b": np.array(["x", "y", "z"])}
+
+    first = cached_arrays("test", "key1", compute, tmp_path)
+    second = cached_arrays("test", "key1", compute, tmp_path)
+
+    assert len(calls) == 1
+    assert list(second.keys()) == ["a", "b"]
+    np.testing.assert_array_equal(second["a"], first["a"])
+    np.testing.assert_array_equal(second["b"], first["b"])
+
+    cached_arrays("test", "key2", compute, tmp_path)
+
+    assert len(calls) == 2
+    assert [f.name for f in tmp_path.glob("test.*.npz")] == ["test.key2.npz"]
+
+
+def test_array_digest():
+    a = np.array([1.0, 2.0, np.nan])
+
+    assert array_digest([a]) == array_digest([a.copy()])
+    assert array_digest([a]) != array_digest([a], salt="skyfield 1.49")
+    assert array_digest([a]) != array_digest([a.astype(np.float32)])
+    assert array_digest([a, a]) != array_digest([np.concatenate([a, a])])
+
+
+def test_stored_arrays(tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"a": np.arange(3)}
+
+    stored_arrays("key1", compute, tmp_path)
+    stored_arrays("key2", compute, tmp_path)
+    result = stored_arrays("key1", compute, tmp_path)
+
+    assert len(calls) == 2
+    assert result["a"].tolist() == [0, 1, 2]
+    assert sorted(f.name for f in tmp_path.glob("*.npz")) == ["key1.npz", "key2.npz"]
+
+
+def test_prune_store(tmp_path):
+    for key in ["key1", "key2", "key3"]:
+        stored_arrays(key, lambda: {"a": np.arange(3)}, tmp_path)
+
+    assert prune_store(tmp_path, ["key2"]) == 2
+    assert [f.name for f in tmp_path.glob("*.npz")] == ["key2.npz"]
+
+
+def test_file_digest(tmp_path):
+    source = tmp_path / "source.dat"
+    source.write_text("hello")
+    cache_path = tmp_path / "cache"
+
+    digest = file_digest(source, cache_path)
+
+    assert digest == file_digest(source)
+    assert (cache_path / "digests.json").exists()
+
+    source.write_text("goodbye")
+
+    assert file_digest(source, cache_path) != digest
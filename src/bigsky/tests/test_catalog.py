@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from src.bigsky.builders import columnar
+from src.bigsky.catalog import Catalog
+
+COLUMNS = {
+    "tyc_id": np.array(["1-8-1", "1-13-1", ""]),
+    "hip_id": np.array([0, 1397, 55203]),
+    "magnitude": np.array([12.15, 8.51, 4.26]),
+    "ra_degrees_j2000": np.array([2.3175, 1.1256, 169.5468]),
+    "dec_degrees_j2000": np.array([2.2319, 2.2674, 31.5308]),
+    "constellation": np.array(["psc", "psc", "uma"]),
+}
+TYPES = {
+    "tyc_id": "string",
+    "hip_id": "int32",
+    "magnitude": "float32",
+    "ra_degrees_j2000": "float32",
+    "dec_degrees_j2000": "float32",
+    "constellation": "category",
+}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = columnar.write(
+        tmp_path / "stars", "numpy", COLUMNS, TYPES, {"version": "0.0.1"}
+    )
+    return Catalog(path)
+
+
+def test_catalog(catalog):
+    assert len(catalog) == 3
+    assert catalog.version == "0.0.1"
+    assert catalog.columns == list(COLUMNS.keys())
+
+    assert isinstance(catalog.ra, np.memmap)
+    assert not catalog.ra.flags.writeable
+    assert catalog.ra is catalog["ra_degrees_j2000"]
+    assert list(catalog.dec) == pytest.approx([2.2319, 2.2674, 31.5308])
+    assert list(catalog.magnitude) == pytest.approx([12.15, 8.51, 4.26])
+    assert list(catalog.hip_id) == [0, 1397, 55203]
+    assert list(catalog.constellation) == [0, 0, 1]
+    assert catalog.categories("constellation") == ["psc", "uma"]
+
+
+def test_catalog_decode(catalog):
+    assert list(catalog.decode("constellation")) == ["psc", "psc", "uma"]
+    assert list(catalog.decode("tyc_id", catalog.magnitude > 5)) == ["1-8-1", "1-13-1"]
+
+    with pytest.raises(ValueError):
+        catalog.decode("magnitude")
+
+
+def test_catalog_unknown_column(catalog):
+    with pytest.raises(KeyError):
+        catalog.column("distance")
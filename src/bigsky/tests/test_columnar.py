@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.bigsky.builders import columnar
+
+COLUMNS = {
+    "ra": np.array([1.5, 2.25, 3.0]),
+    "bv": np.array([0.5, np.nan, 1.0]),
+    "hip_id": np.array([0, 42, 7]),
+    "tyc_id": np.array(["1-8-1", "", "2-976-1"]),
+    "bayer": np.array(["", "α", "β"]),
+}
+TYPES = {
+    "ra": "float32",
+    "bv": "float32",
+    "hip_id": "int32",
+    "tyc_id": "string",
+    "bayer": "category",
+}
+
+
+def test_write_numpy(tmp_path):
+    path = columnar.write(tmp_path / "stars", "numpy", COLUMNS, TYPES, {"version": "1"})
+
+    meta = json.loads((path / "meta.json").read_text())
+
+    assert meta["version"] == "1"
+    assert meta["count"] == 3
+    assert meta["columns"]["bayer"] == {"type": "category", "categories": ["α", "β"]}
+
+    ra = np.load(path / "ra.npy", mmap_mode="r")
+    assert ra.dtype == np.float32
+    assert list(ra) == [1.5, 2.25, 3.0]
+
+    assert list(np.load(path / "hip_id.npy")) == [0, 42, 7]
+    assert list(np.load(path / "tyc_id.npy")) == [b"1-8-1", b"", b"2-976-1"]
+    assert list(np.load(path / "bayer.npy")) == [-1, 0, 1]
+
+
+def test_write_arrow(tmp_path):
+    pytest.importorskip("pyarrow")
+    from pyarrow import feather
+
+    filename = columnar.write(tmp_path / "stars", "feather", COLUMNS, TYPES)
+    table = feather.read_table(filename, memory_map=True)
+
+    assert filename.name == "stars.feather"
+    assert table.column("bv").to_pylist() == [0.5, None, 1.0]
+    assert table.column("hip_id").to_pylist() == [None, 42, 7]
+    assert table.column("tyc_id").to_pylist() == ["1-8-1", None, "2-976-1"]
+    assert table.column("bayer").to_pylist() == [None, "α", "β"]
+
+
+def test_write_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        columnar.write(tmp_path / "stars", "xml", COLUMNS, TYPES)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.bigsky.crossmatch import crossmatch
+from src.bigsky.tiling import separation
+
+
+def random_positions(rng, count):
+    return rng.uniform(0, 360, count), np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+
+
+@pytest.mark.parametrize("radius", [0.5, 2, 10])
+def test_crossmatch(radius):
+    rng = np.random.default_rng(42)
+    ra1, dec1 = random_positions(rng, 2000)
+    ra2, dec2 = random_positions(rng, 3000)
+
+    index1, index2, separations = crossmatch(ra1, dec1, ra2, dec2, radius)
+
+    # compare with all pairs
+    pairs = separation(ra1[:, None], dec1[:, None], ra2[None, :], dec2[None, :])
+    matched = pairs.min(axis=1) <= radius
+
+    assert matched.any()
+    assert list(index1) == list(np.flatnonzero(matched))
+    assert list(index2) == list(pairs.argmin(axis=1)[matched])
+    assert separations == pytest.approx(pairs.min(axis=1)[matched])
+
+
+def test_crossmatch_wraps_around_ra_0_and_poles():
+    index1, index2, separations = crossmatch(
+        [359.99995, 0.00005, 10, 100],
+        [0, 1, 89.9999, -45],
+        [0.00002, 359.99998, 190, 20, 100.01],
+        [0, 1, 89.9999, -45, -45],
+        1 / 3600,
+    )
+
+    assert list(index1) == [0, 1, 2]
+    assert list(index2) == [0, 1, 2]
+    assert (separations <= 1 / 3600).all()
+
+
+def test_crossmatch_empty():
+    index1, index2, separations = crossmatch([], [], [10], [10], 1)
+
+    assert len(index1) == len(index2) == len(separations) == 0
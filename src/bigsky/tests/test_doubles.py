@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.bigsky.benchmarks.wds import wds_line, write_wds
+from src.bigsky.builders import columnar, doubles
+from src.bigsky.catalog import Catalog
+from src.bigsky.cli import main
+
+
+@pytest.fixture
+def raw_data(tmp_path):
+    """Creates a WDS file with 3 double stars, and a star catalog with 2 stars near the first 2 doubles"""
+    raw = tmp_path / "raw"
+    build = tmp_path / "build"
+    write_wds(raw, 0)
+
+    with open(raw / "wds" / "wds_all.txt", "a") as outfile:
+        outfile.write(wds_line("00001", 1.5, -30.25))
+        outfile.write(wds_line("00001", 1.5, -30.25))  # duplicate
+        outfile.write(wds_line("00002", 12, 60.5))
+        outfile.write(wds_line("00003", 20, 0))
+
+    columnar.write_numpy(
+        build / f"bigsky.{doubles.VERSION}.stars",
+        {
+            "tyc_id": ["1-2-1", "3-4-1"],
+            "hip_id": [0, 5413],
+            "ra_degrees_j2000": [180.0005, 22.5 + 1 / 3600],
+            "dec_degrees_j2000": [60.5, -30.25],
+        },
+        {
+            "tyc_id": "string",
+            "hip_id": "int32",
+            "ra_degrees_j2000": "float32",
+            "dec_degrees_j2000": "float32",
+        },
+    )
+
+    return raw, build
+
+
+def test_build(raw_data):
+    raw, build = raw_data
+
+    metrics = doubles.build(data_path=raw, build_path=build, formats=["csv", "numpy"])
+
+    assert metrics["rows"] == 3
+    assert metrics["linked"] == 2
+
+    lines = (build / f"bigsky.{doubles.VERSION}.doubles.csv").read_text().splitlines()
+
+    assert lines[0] == ",".join(doubles.COLUMN_TYPES)
+    assert lines[1].startswith("00001,22.5,-30.25,3-4-1,5413,")
+    assert lines[2].startswith("00002,180.0,60.5,1-2-1,,")
+    assert lines[3] == "00003,300.0,0.0,,,"
+
+    catalog = Catalog(build / f"bigsky.{doubles.VERSION}.doubles")
+
+    assert list(catalog.hip_id) == [5413, 0, 0]
+    assert catalog.column("separation_arcsec")[0] == pytest.approx(0.864, abs=0.01)
+    assert np.isnan(catalog.column("separation_arcsec")[2])
+
+
+def test_build_without_stars(raw_data, tmp_path):
+    raw, _ = raw_data
+
+    with pytest.raises(FileNotFoundError):
+        doubles.build(data_path=raw, build_path=tmp_path / "empty")
+
+
+def test_cli_build_doubles(raw_data, capsys):
+    raw, build = raw_data
+
+    main(
+        [
+            "build",
+            "doubles",
+            "--data",
+            str(raw),
+            "--output",
+            str(build),
+            "--radius",
+            "0.5",
+            "--formats",
+            "csv",
+        ]
+    )
+
+    assert json.loads(capsys.readouterr().out)["linked"] == 0
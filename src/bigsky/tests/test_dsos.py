@@ -0,0 +1,97 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.bigsky.builders import dsos
+from src.bigsky.catalog import Catalog
+from src.bigsky.cli import main
+
+DATA_PATH = Path(__file__).parent.resolve() / "data"
+
+
+@pytest.fixture
+def raw_data(tmp_path):
+    """Creates a minimal raw data directory for the deep sky objects build, using the OpenNGC test files"""
+    raw = tmp_path / "raw"
+    shutil.copytree(DATA_PATH / "ongc", raw / "ongc")
+    return raw, tmp_path / "build"
+
+
+def test_sexagesimal():
+    values = np.array(["05:35:16.26", "-05:23:16.4", "+41:16:08.6", "-00:30", ""])
+    result = dsos.sexagesimal(values)
+
+    assert result[:4] == pytest.approx(
+        [5 + 35 / 60 + 16.26 / 3600, -(5 + 23 / 60 + 16.4 / 3600), 41.26905556, -0.5]
+    )
+    assert np.isnan(result[4])
+
+
+def test_to_ints():
+    assert list(dsos.to_ints(np.array(["031", "", "0224,0225"]))) == [31, 0, 224]
+
+
+def test_load_dsos():
+    columns = dsos.load_dsos(DATA_PATH)
+    names = list(columns["name"])
+
+    assert "NGC7833" not in names  # no position
+    assert len(names) == 7
+
+    andromeda = names.index("NGC0224")
+    assert columns["ra_degrees_j2000"][andromeda] == pytest.approx(10.68479167)
+    assert columns["dec_degrees_j2000"][andromeda] == pytest.approx(41.26905556)
+    assert columns["magnitude"][andromeda] == 3.44
+    assert columns["m"][andromeda] == 31
+    assert columns["ngc"][andromeda] == 224
+    assert columns["constellation"][andromeda] == "and"
+
+    ic342 = names.index("IC0342")
+    assert columns["magnitude"][ic342] == 9.1  # B magnitude
+    assert columns["ic"][ic342] == 342
+    assert columns["ngc"][ic342] == 0
+
+    # identifiers don't carry over from the previous row
+    horsehead = names.index("B033")
+    assert columns["ngc"][horsehead] == columns["ic"][horsehead] == 0
+    assert columns["m"][names.index("M040")] == 40
+
+
+def test_build(raw_data):
+    raw, build = raw_data
+
+    metrics = dsos.build(data_path=raw, build_path=build, formats=["numpy"])
+
+    assert metrics["rows"] == 7
+    assert (build / f"bigsky.{dsos.VERSION}.dsos.metrics.json").exists()
+
+    catalog = Catalog(build / f"bigsky.{dsos.VERSION}.dsos")
+
+    assert len(catalog) == 7
+    assert catalog.columns == list(dsos.COLUMN_TYPES)
+
+    orion = catalog.cone_search(83.8, -5.4, 1)
+    assert list(catalog.decode("name", orion)) == ["NGC1976"]
+    assert list(catalog.decode("type", orion)) == ["Cl+N"]
+    assert catalog.cone_search(83.8, -5.4, 5, mag_limit=5).tolist() == orion.tolist()
+    assert list(catalog.decode("name", catalog.cone_search(83.8, -5.4, 5))) == [
+        "NGC1976",
+        "B033",
+    ]
+
+    rows, _ = catalog.sky_index().query_knn([83.8], [-5.4], k=2)
+    assert list(catalog.decode("name", rows[0])) == ["NGC1976", "B033"]
+
+
+def test_cli_build_dsos(raw_data, capsys):
+    raw, build = raw_data
+
+    main(["build", "dsos", "--data", str(raw), "--output", str(build)])
+
+    metrics = json.loads(capsys.readouterr().out)
+
+    assert metrics["rows"] == 7
+    assert (build / f"bigsky.{dsos.VERSION}.dsos.parquet").exists()
@@ -0,0 +1,294 @@
+import numpy as np
+import pytest
+
+from src.bigsky.loaders.utils import (
+    DoubleStar,
+    Star,
+    assign_tiles,
+    bulk_load,
+    create_indexes,
+    db,
+    init_db,
+    parse_sexagesimal,
+)
+from src.bigsky.benchmarks.wds import wds_line, write_wds
+from src.bigsky.loaders.ongc import load_ongc
+from src.bigsky.loaders.tycho1 import load_tycho_1
+from src.bigsky.loaders.utils import DeepSkyObject
+from src.bigsky.loaders.wds import link_double_stars, load_wds
+from src.bigsky.models import box_search, cone_search, tile_of
+from src.bigsky.tiling import separation
+
+
+def test_bulk_load(tmp_path):
+    init_db(str(tmp_path / "bigsky.db"), bulk=True)
+
+    try:
+        assert db.get_indexes("doublestar") == []
+
+        rows = (
+            dict(
+                name=f"star-{i}", ra=i / 10, dec=-i / 10, magnitude=i, hip_id=i or None
+            )
+            for i in range(2500)
+        )
+        assert bulk_load(Star, rows) == 2500
+        assert bulk_load(Star, []) == 0
+
+        create_indexes()
+
+        assert Star.select().count() == 2500
+        assert Star.get(Star.name == "star-42").dec == -4.2
+        assert Star.get(Star.name == "star-0").hip_id is None
+        assert {index.name for index in db.get_indexes("doublestar")} == {
+            "doublestar_hip_id",
+            "doublestar_tile",
+            "doublestar_wds_id",
+        }
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def stars_db(tmp_path):
+    rng = np.random.default_rng(42)
+    ra = rng.uniform(0, 24, 20_000)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, 20_000)))
+    magnitude = rng.uniform(0, 12, 20_000)
+
+    init_db(str(tmp_path / "bigsky.db"), bulk=True)
+    bulk_load(
+        Star,
+        (
+            dict(name=f"star-{i}", ra=ra[i], dec=dec[i], magnitude=magnitude[i])
+            for i in range(len(ra))
+        ),
+    )
+    assign_tiles(batch_size=3000)
+    create_indexes()
+
+    yield ra, dec, magnitude
+
+    db.close()
+
+
+def names(rows) -> set:
+    return {row.name for row in rows}
+
+
+def expected(mask) -> set:
+    return {f"star-{i}" for i in np.flatnonzero(mask)}
+
+
+def test_assign_tiles(stars_db):
+    ra, dec, _ = stars_db
+
+    assert Star.select().where(Star.tile.is_null()).count() == 0
+    assert Star.get(Star.name == "star-7").tile == tile_of(ra[7], dec[7])
+
+
+@pytest.mark.parametrize(
+    "ra,dec,radius,mag_limit",
+    [(1, 20, 5, None), (23.9, -10, 3, 8), (12, 88, 4, None)],
+)
+def test_cone_search(stars_db, ra, dec, radius, mag_limit):
+    ra_points, dec_points, magnitude = stars_db
+    mask = separation(ra * 15, dec, ra_points * 15, dec_points) <= radius
+
+    if mag_limit is not None:
+        mask &= magnitude <= mag_limit
+
+    assert mask.any()
+    assert names(cone_search(Star, ra, dec, radius, mag_limit)) == expected(mask)
+
+
+@pytest.mark.parametrize(
+    "ra_min,ra_max,dec_min,dec_max,mag_limit",
+    [(2, 3, -10, 10, None), (23, 1, 30, 50, 6)],
+)
+def test_box_search(stars_db, ra_min, ra_max, dec_min, dec_max, mag_limit):
+    ra, dec, magnitude = stars_db
+
+    if ra_min <= ra_max:
+        mask = (ra >= ra_min) & (ra <= ra_max)
+    else:
+        mask = (ra >= ra_min) | (ra <= ra_max)
+
+    mask &= (dec >= dec_min) & (dec <= dec_max)
+
+    if mag_limit is not None:
+        mask &= magnitude <= mag_limit
+
+    assert mask.any()
+    rows = box_search(Star, ra_min, ra_max, dec_min, dec_max, mag_limit)
+    assert names(rows) == expected(mask)
+
+
+def test_search_uses_indexes(stars_db):
+    plan = db.execute_sql(
+        "EXPLAIN QUERY PLAN SELECT * FROM star WHERE tile BETWEEN 10 AND 20 AND magnitude <= 6"
+    ).fetchall()
+
+    assert "star_tile_magnitude" in str(plan)
+
+    with pytest.raises(ValueError):
+        cone_search(DoubleStar, 1, 20, 5, mag_limit=6)
+
+
+@pytest.mark.parametrize(
+    "value,separator,expected",
+    [
+        ("05:35:16.26", ":", 5 + 35 / 60 + 16.26 / 3600),
+        ("-05:23:16.4", ":", -(5 + 23 / 60 + 16.4 / 3600)),
+        ("+41 16 08.6", " ", 41 + 16 / 60 + 8.6 / 3600),
+        ("-00 30 00", " ", -0.5),
+    ],
+)
+def test_parse_sexagesimal(value, separator, expected):
+    assert parse_sexagesimal(value, separator) == pytest.approx(expected)
+
+
+def test_load_ongc(tmp_path):
+    header = "Name;Type;RA;Dec;MajAx;MinAx;PosAng;B-Mag;V-Mag;M;NGC;IC;Common names"
+    ongc_path = tmp_path / "ongc"
+    ongc_path.mkdir()
+    (ongc_path / "NGC.csv").write_text(
+        "\n".join(
+            [
+                header,
+                "IC0001;**;00:08:27.05;+27:43:03.6;;;;;;;;;",
+                "NGC0224;G;00:42:44.35;+41:16:08.6;177.83;69.66;35;4.29;3.44;031;;;Andromeda Galaxy",
+                "NGC0225;OCl;00:43:31.5;+61:46:54;;;;7.23;7.00;;;;",
+                "NGC1976;Cl+N;05:35:16.26;-05:23:16.4;90.00;60.00;;;4.00;042;;;Orion Nebula",
+            ]
+        )
+    )
+    (ongc_path / "addendum.csv").write_text(
+        "\n".join([header, "NGC5466;GCl;14:05:27.29;+28:32:04.0;;;;;;;;;"])
+    )
+
+    init_db(str(tmp_path / "bigsky.db"), bulk=True)
+
+    try:
+        load_ongc(str(tmp_path))
+
+        assert DeepSkyObject.select().count() == 5
+        andromeda = DeepSkyObject.get(DeepSkyObject.ngc == 224)
+        assert andromeda.m == 31
+        assert andromeda.ra == 0.712319
+        assert DeepSkyObject.get(DeepSkyObject.m == 42).dec == -5.387889
+
+        # tiles are assigned by the loader, so searches find the objects
+        assert [d.m for d in cone_search(DeepSkyObject, 5.59, -5.4, 0.5)] == [42]
+    finally:
+        db.close()
+
+
+def test_load_wds(tmp_path):
+    write_wds(tmp_path, 1000, duplicates=0.1)
+
+    with open(tmp_path / "wds" / "wds_all.txt", "a") as outfile:
+        outfile.write(wds_line("99999", 1.5, -30.25))
+        outfile.write(wds_line("99999", 2.5, 30.25))
+        outfile.write(wds_line("99999", 3.5, 60.25))
+
+    init_db(str(tmp_path / "bigsky.db"), bulk=True)
+
+    try:
+        duplicates = load_wds(str(tmp_path))
+
+        assert duplicates["99999"] == 2
+        assert DoubleStar.select().count() == 1003 - duplicates.total()
+
+        double_star = DoubleStar.get(DoubleStar.wds_id == "99999")
+        assert double_star.ra == pytest.approx(1.5)
+        assert double_star.dec == pytest.approx(-30.25)
+    finally:
+        db.close()
+
+
+def test_link_double_stars(tmp_path):
+    write_wds(tmp_path, 0)
+
+    with open(tmp_path / "wds" / "wds_all.txt", "a") as outfile:
+        outfile.write(wds_line("00001", 1.5, -30.25))
+        outfile.write(wds_line("00002", 2.5, 30.25))
+
+    init_db(str(tmp_path / "bigsky.db"), bulk=True)
+
+    try:
+        bulk_load(
+            Star,
+            [
+                dict(name="near", ra=1.5 + 1 / 3600 / 15, dec=-30.25, magnitude=5),
+                dict(name="far", ra=1.5, dec=-30.2, magnitude=5),
+                dict(name="nearest", ra=2.5, dec=30.25 + 0.5 / 3600, magnitude=5),
+            ],
+        )
+        load_wds(str(tmp_path))
+
+        assert link_double_stars(radius=5) == 2
+        assert DoubleStar.get(DoubleStar.wds_id == "00001").hip.name == "near"
+        assert DoubleStar.get(DoubleStar.wds_id == "00002").hip.name == "nearest"
+
+        assert link_double_stars(radius=0.75) == 1
+        assert DoubleStar.get(DoubleStar.wds_id == "00001").hip is None
+    finally:
+        db.close()
+
+
+def tycho_1_line(ra: str, dec: str, magnitude: str) -> str:
+    """Returns a line of the Tycho-1 `tyc_main.dat` with a position and a magnitude"""
+    row = [""] * 38
+    row[3], row[4], row[5] = ra, dec, magnitude
+    return "|".join(row) + "\n"
+
+
+def test_link_double_stars_southern(tmp_path):
+    (tmp_path / "tycho-1").mkdir()
+    (tmp_path / "tycho-1" / "tyc_main.dat").write_text(
+        tycho_1_line("05 35 16.26", "-05 23 16.4", " 5.00")
+        + tycho_1_line("05 35 16.26", "-04 36 43.6", " 6.00")
+        + tycho_1_line("05 35 16.26", "+05 23 16.4", " 7.00")
+    )
+    write_wds(tmp_path, 0)
+
+    with open(tmp_path / "wds" / "wds_all.txt", "a") as outfile:
+        outfile.write(wds_line("00001", 5 + 35 / 60 + 16.26 / 3600, -5.387889))
+
+    init_db(str(tmp_path / "bigsky.db"), bulk=True)
+
+    try:
+        load_tycho_1(str(tmp_path))
+        load_wds(str(tmp_path))
+
+        assert Star.get(Star.magnitude == 5).dec == -5.387889
+        assert link_double_stars() == 1
+        assert DoubleStar.get(DoubleStar.wds_id == "00001").hip.magnitude == 5
+    finally:
+        db.close()
+
+
+def test_search_after_load(tmp_path, caplog):
+    (tmp_path / "tycho-1").mkdir()
+    (tmp_path / "tycho-1" / "tyc_main.dat").write_text(
+        tycho_1_line("05 35 16.26", "-05 23 16.4", " 5.00")
+    )
+    init_db(str(tmp_path / "bigsky.db"))
+
+    try:
+        load_tycho_1(str(tmp_path))
+
+        assert [s.magnitude for s in cone_search(Star, 5.59, -5.4, 0.5)] == [5]
+        assert [s.magnitude for s in box_search(Star, 5, 6, -6, -5)] == [5]
+
+        create_indexes()
+        assert "no sky tile" not in caplog.text
+
+        Star.create(name="untiled", ra=5.59, dec=-5.4, magnitude=6)
+        create_indexes()
+
+        assert len(cone_search(Star, 5.59, -5.4, 0.5)) == 1
+        assert "1 Star rows have no sky tile" in caplog.text
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from skyfield.api import Star
+
+from src.bigsky.builders import columnar
+from src.bigsky.builders.stars import COLUMN_TYPES, Epoch, earth
+from src.bigsky.catalog import Catalog
+from src.bigsky.propagation import propagate
+from src.bigsky.tiling import separation
+
+STARS = dict(
+    # Barnard's Star, a star near the pole, a distant star, and a star without a parallax
+    ra=np.array([269.452, 10.0, 200.0, 45.0]),
+    dec=np.array([4.6934, 89.5, -30.0, -88.0]),
+    ra_mas_per_year=np.array([-798.58, 500, 10, 300]),
+    dec_mas_per_year=np.array([10328.12, -200, -5, 100]),
+    parallax_mas=np.array([548.31, 2, 1, 0]),
+)
+
+
+def skyfield_star() -> Star:
+    return Star(
+        ra_hours=STARS["ra"] / 15,
+        dec_degrees=STARS["dec"],
+        ra_mas_per_year=STARS["ra_mas_per_year"],
+        dec_mas_per_year=STARS["dec_mas_per_year"],
+        parallax_mas=STARS["parallax_mas"],
+        epoch=Epoch.J_2000,
+    )
+
+
+@pytest.fixture
+def catalog() -> dict:
+    """Star catalog columns, with J2000 positions from Skyfield (same as the stars build)"""
+    ra, dec, _ = earth().at(Epoch.J_2000).observe(skyfield_star()).radec()
+    return dict(
+        ra_degrees_j2000=ra._degrees,
+        dec_degrees_j2000=dec.degrees,
+        ra_mas_per_year=STARS["ra_mas_per_year"],
+        dec_mas_per_year=STARS["dec_mas_per_year"],
+        parallax_mas=STARS["parallax_mas"],
+    )
+
+
+def skyfield_positions(year):
+    ra, dec, _ = earth().at(Epoch.create(year)).observe(skyfield_star()).radec()
+    return ra._degrees, dec.degrees
+
+
+@pytest.mark.parametrize("year", [1900, 1991.25, 2000, 2050.5])
+def test_propagate_accurate(catalog, year):
+    ra, dec = propagate(catalog, year)
+    expected_ra, expected_dec = skyfield_positions(year)
+
+    errors_mas = separation(ra, dec, expected_ra, expected_dec) * 3_600_000
+
+    assert (errors_mas < 0.5).all()
+
+
+def test_propagate_fast(catalog):
+    ra, dec = propagate(catalog, 2050, mode="fast")
+    expected_ra, expected_dec = skyfield_positions(2050)
+
+    errors_mas = separation(ra, dec, expected_ra, expected_dec) * 3_600_000
+
+    # errors are about the parallax, except near the pole
+    assert errors_mas[0] < 600
+    assert errors_mas[2:] == pytest.approx([0, 0], abs=20)
+
+
+def test_propagate_index(catalog):
+    ra, dec = propagate(catalog, 2030, index=np.array([False, True, False, True]))
+    all_ra, all_dec = propagate(catalog, 2030)
+
+    assert list(ra) == list(all_ra[[1, 3]])
+    assert list(dec) == list(all_dec[[1, 3]])
+
+
+def test_propagate_catalog(catalog, tmp_path):
+    columnar.write_numpy(
+        tmp_path / "stars",
+        catalog,
+        {name: COLUMN_TYPES[name] for name in catalog},
+    )
+    stars = Catalog(tmp_path / "stars")
+
+    ra, dec = propagate(stars, Epoch.create(2040), index=[0, 2])
+    expected_ra, expected_dec = propagate(catalog, 2040, index=[0, 2])
+
+    # the catalog's columns are float32
+    assert (separation(ra, dec, expected_ra, expected_dec) * 3600 < 0.1).all()
+
+
+def test_propagate_unknown_mode(catalog):
+    with pytest.raises(ValueError):
+        propagate(catalog, 2050, mode="exact")
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from src.bigsky.skyindex import SkyIndex
+from src.bigsky.tiling import separation
+
+
+def random_positions(rng, count):
+    return rng.uniform(0, 360, count), np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+
+
+@pytest.fixture
+def positions():
+    rng = np.random.default_rng(42)
+    return random_positions(rng, 5000), random_positions(rng, 300)
+
+
+@pytest.mark.parametrize("band", [0.1, 1, 5])
+def test_query_radius(positions, band):
+    (ra, dec), (query_ra, query_dec) = positions
+    index = SkyIndex.build(ra, dec, band=band)
+    radius = np.linspace(0.5, 8, len(query_ra))
+
+    queries, rows, separations = index.query_radius(query_ra, query_dec, radius)
+
+    pairs = separation(query_ra[:, None], query_dec[:, None], ra, dec)
+    expected_queries, expected_rows = np.nonzero(pairs <= radius[:, None])
+
+    assert len(rows) > 0
+    assert sorted(zip(queries.tolist(), rows.tolist())) == sorted(
+        zip(expected_queries.tolist(), expected_rows.tolist())
+    )
+    assert separations == pytest.approx(pairs[queries, rows])
+    assert (np.diff(queries) >= 0).all()
+
+
+def test_query_knn(positions):
+    (ra, dec), (query_ra, query_dec) = positions
+    index = SkyIndex.build(ra, dec)
+
+    rows, separations = index.query_knn(query_ra, query_dec, k=7)
+
+    pairs = separation(query_ra[:, None], query_dec[:, None], ra, dec)
+
+    assert rows.tolist() == np.argsort(pairs, axis=1)[:, :7].tolist()
+    assert separations == pytest.approx(np.sort(pairs, axis=1)[:, :7])
+
+
+def test_query_knn_fewer_positions():
+    index = SkyIndex.build([10, 20], [0, 0])
+
+    rows, separations = index.query_knn([12], [0], k=3)
+
+    assert rows.tolist() == [[0, 1, -1]]
+    assert separations[0, :2] == pytest.approx([2, 8])
+    assert np.isnan(separations[0, 2])
+
+    rows, separations = SkyIndex.build([], []).query_knn([12], [0], k=1)
+    assert rows.tolist() == [[-1]]
+
+
+def test_nearest():
+    index = SkyIndex.build([359.9999, 0.001, 180], [0, 0, 89.99])
+
+    queries, rows, separations = index.nearest([0, 0, 10], [0, 10, 89.99], 0.1)
+
+    assert queries.tolist() == [0, 2]
+    assert rows.tolist() == [0, 2]
+    assert separations == pytest.approx([0.0001, 0.02], abs=1e-4)
+
+
+def test_save_load(positions, tmp_path):
+    (ra, dec), (query_ra, query_dec) = positions
+    index = SkyIndex.build(ra, dec)
+    index.save(tmp_path / "index")
+
+    loaded = SkyIndex.load(tmp_path / "index")
+
+    assert isinstance(loaded.xyz, np.memmap)
+    assert len(loaded) == len(index)
+    assert loaded.band == index.band
+
+    for expected, actual in zip(
+        index.query_knn(query_ra, query_dec, k=3),
+        loaded.query_knn(query_ra, query_dec, k=3),
+    ):
+        assert (expected == actual).all()
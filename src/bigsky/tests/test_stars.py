@@ -1,15 +1,36 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
 from pathlib import Path
 
+import numpy as np
 import pytest
 
+from src.bigsky.benchmarks.stars import write_raw
+from src.bigsky.builders import stars
+from src.bigsky.cli import main
+from src.bigsky.catalog import Catalog
 from src.bigsky.builders.stars import (
     parse_float,
     parse_hip,
     format_tyc,
     tycho2_bv_v,
     tycho2_read,
+    tycho2_read_batches,
+    round_floats,
+    to_j2000,
+    to_j2000_batch,
+    constellations_at,
+    Epoch,
     StarRow,
+    StarBatch,
+    process,
+    csv_rows,
     TYCHO_1,
+    Tycho1Reference,
+    tyc_key,
     greek,
 )
 
@@ -163,6 +184,569 @@ def test_star_row_from_tyc2_suppl_dat():
     ]
 
 
-# def test_tycho1_reference():
-#     star = TYCHO_1.get(5413)
-#     assert star["parallax_mas"] == 1.77
+def test_to_j2000_batch_matches_to_j2000():
+    fields = [StarRow.tyc2_fields(r) for r in tycho2_read(DATA_PATH / "tyc2.dat")]
+    fields += [
+        StarRow.supp_fields(r) for r in tycho2_read(DATA_PATH / "tyc2_suppl.dat")
+    ]
+    parallax_mas = [0] * len(fields)
+    parallax_mas[0] = 12.5  # make sure parallax is exercised too
+
+    ra, dec = to_j2000_batch(
+        [f["ra_degrees"] for f in fields],
+        [f["dec_degrees"] for f in fields],
+        [f["ra_mas_per_year"] for f in fields],
+        [f["dec_mas_per_year"] for f in fields],
+        parallax_mas=parallax_mas,
+        epoch=[f["epoch"] for f in fields],
+    )
+
+    assert len(ra) == len(dec) == len(fields)
+
+    for f, p, batch_ra, batch_dec in zip(fields, parallax_mas, ra, dec):
+        expected_ra, expected_dec = to_j2000(
+            f["ra_degrees"],
+            f["dec_degrees"],
+            f["ra_mas_per_year"],
+            f["dec_mas_per_year"],
+            parallax_mas=p,
+            epoch=Epoch.create(f["epoch"]),
+        )
+        assert batch_ra == pytest.approx(expected_ra, abs=1e-9)
+        assert batch_dec == pytest.approx(expected_dec, abs=1e-9)
+
+
+def tyc2_lines() -> list[bytes]:
+    lines = (DATA_PATH / "tyc2.dat").read_bytes().splitlines(keepends=True)
+    # with a HIP id and CCDM component, at bytes 143-151
+    lines.append(lines[0][:142] + b"  5413B  " + lines[0][151:])
+    return lines
+
+
+def test_star_batch_from_tyc2_records_matches_tyc2_fields(tmp_path, monkeypatch):
+    monkeypatch.setattr(stars, "IAU_NAMES", {5413: "Starname"})
+    monkeypatch.setattr(stars, "CROSSREF", {5413: {"hd_id": 6805, "bayer": "α"}})
+    filename = tmp_path / "tyc2.dat"
+    filename.write_bytes(b"".join(tyc2_lines()))
+
+    batches = list(tycho2_read_batches(filename, batch_size=3))
+
+    assert [len(b) for b in batches] == [3, 1]
+
+    fields = [StarRow.tyc2_fields(r) for r in tycho2_read(filename)]
+    expected = StarBatch.from_fields(fields)
+    batch = StarBatch.from_tyc2_records(np.concatenate(batches))
+
+    for name in ("tyc_id", "tyc_key", "hip_id", "ccdm", "magnitude", "bv", "epoch"):
+        np.testing.assert_array_equal(getattr(batch, name), getattr(expected, name))
+
+    rows = [r.to_row() for r in process(batch).to_rows()]
+
+    assert rows == [StarRow.from_fields(f).to_row() for f in fields]
+    assert rows[-1][:3] == ["1-8-1", 5413, "B"]
+    assert rows[-1][10:14] == ["Starname", 6805, "α", None]
+
+
+def test_star_batch_to_columns_matches_star_rows():
+    fields = [StarRow.tyc2_fields(r) for r in tycho2_read(DATA_PATH / "tyc2.dat")]
+    fields += [
+        StarRow.supp_fields(r) for r in tycho2_read(DATA_PATH / "tyc2_suppl.dat")
+    ]
+    fields += [StarRow.extra_fields(d) for d in stars.EXTRA_STARS]
+    batch = process(StarBatch.from_fields(fields))
+    rows = batch.to_rows()
+    columns = batch.to_columns()
+    expected = StarRow.to_columns(rows)
+
+    for name in StarRow.header():
+        np.testing.assert_array_equal(columns[name], expected[name])
+        assert columns[name].dtype.kind == expected[name].dtype.kind
+
+    # compared as strings, so 0 and 0.0 are different values
+    csv_values = [["" if v is None else str(v) for v in r.to_row()] for r in rows]
+    assert [[str(v) for v in row] for row in csv_rows(columns)] == csv_values
+
+
+def test_tycho2_read_batches_without_last_line_break(tmp_path):
+    filename = tmp_path / "tyc2.dat"
+    filename.write_bytes(b"".join(tyc2_lines()).rstrip(b"\n"))
+
+    (records,) = tycho2_read_batches(filename)
+
+    assert records.shape == (4, 207)
+
+
+def test_tycho2_read_batches_not_fixed_width(tmp_path):
+    lines = tyc2_lines()
+    filename = tmp_path / "tyc2.dat"
+    filename.write_bytes(lines[0] + lines[1][1:] + lines[2])
+
+    with pytest.raises(ValueError):
+        list(tycho2_read_batches(filename))
+
+
+def test_shard_batches_skips_malformed_records(tmp_path):
+    lines = tyc2_lines()
+    lines[1] = lines[1][:41] + b"  -x6.3" + lines[1][48:]  # proper motion in RA
+    (tmp_path / "tycho-2").mkdir()
+    (tmp_path / "tycho-2" / "tyc2.dat.00").write_bytes(b"".join(lines))
+
+    shard = stars.Shard("tyc2.00", "tycho2", "tyc2.dat.00")
+    result = stars.ShardResult(shard)
+    batches = list(stars.shard_batches(shard, tmp_path, result))
+
+    assert [t for b in batches for t in b.tyc_id] == ["1-8-1", "1-16-1", "1-8-1"]
+    assert result.count == 4
+    assert result.errors == 1
+
+
+def test_round_floats():
+    values = np.array([1.00005, 2.5, 0.12345678, 75.18055, np.nan])
+    rounded = round_floats(values, 4)
+
+    assert rounded[:-1].tolist() == [round(v, 4) for v in values[:-1].tolist()]
+    assert np.isnan(rounded[-1])
+
+
+def test_import_does_not_load_ephemeris(tmp_path):
+    # in an empty directory, loading de421.bsp would download it
+    src = Path(__file__).parents[2]
+    code = (
+        "from bigsky.builders import stars; "
+        "assert stars.parse_float('1.23456') == 1.2346; "
+        "assert stars.ephemeris.cache_info().currsize == 0; "
+        "assert stars.constellation_map.cache_info().currsize == 0"
+    )
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=tmp_path,
+        env=dict(os.environ, PYTHONPATH=str(src)),
+        check=True,
+    )
+
+    assert not (tmp_path / "de421.bsp").exists()
+
+
+def test_to_j2000_batch_empty():
+    ra, dec = to_j2000_batch([], [], [], [])
+    assert len(ra) == len(dec) == 0
+
+
+def test_constellations_at():
+    result = constellations_at(
+        [2.3175, 17.3031, 269.0, 83.8], [2.2319, 2.5526, -89.5, -5.4]
+    )
+    assert list(result) == ["psc", "cet", "oct", "ori"]
+
+
+def test_constellations_at_empty():
+    assert len(constellations_at([], [])) == 0
+
+
+def test_tyc_key():
+    assert tyc_key("8479-45-1") == 8479000451
+    assert tyc_key("1-12121-4") == 1121214
+
+
+def test_tycho1_reference():
+    reference = Tycho1Reference.from_columns(
+        [5413, tyc_key("1-8-1"), 1397, 5413],
+        {
+            "magnitude": [11.5, 12.1, None, 0],
+            "parallax_mas": [1.77, None, None, 2.5],
+            "ra_mas_per_year": [-7.8, None, 5.5, None],
+            "dec_mas_per_year": [-28.5, None, None, None],
+        },
+    )
+
+    assert len(reference) == 3
+    assert reference.get(5413) == {
+        "magnitude": 11.5,
+        "parallax_mas": 2.5,  # last value wins for duplicates...
+        "ra_mas_per_year": -7.8,  # ...unless it's missing
+        "dec_mas_per_year": -28.5,
+    }
+    assert reference.get("1-8-1") == {"magnitude": 12.1}
+    assert reference.get(1397) == {"ra_mas_per_year": 5.5}
+    assert reference.get(42) == {}
+
+    values = reference.lookup([1397, 42, 5413])
+    assert values["ra_mas_per_year"][0] == 5.5
+    assert all(np.isnan(v[1]) for v in values.values())
+    assert values["parallax_mas"][2] == 2.5
+
+
+def test_tycho1_reference_empty():
+    assert TYCHO_1.get(5413) == {}
+
+
+@pytest.fixture
+def raw_data(tmp_path):
+    """Creates a minimal raw data directory for the stars build, using the Tycho-2 test files"""
+    raw = tmp_path / "raw"
+    for directory in ["tycho-1", "tycho-2", "IV_27A", "iau-star-names"]:
+        (raw / directory).mkdir(parents=True)
+
+    for t in range(0, 20):
+        (raw / "tycho-2" / f"tyc2.dat.{t:02}").touch()
+
+    shutil.copy(DATA_PATH / "tyc2.dat", raw / "tycho-2" / "tyc2.dat.00")
+    shutil.copy(DATA_PATH / "tyc2_suppl.dat", raw / "tycho-2" / "suppl_1.dat")
+
+    hip = [
+        "H",
+        "        5413",
+        " ",
+        "",
+        "",
+        " 11.50",
+        "",
+        "",
+        "",
+        "",
+        "",
+        "  1.77",
+        "  -7.80",
+        " -28.50",
+    ]
+    tyc = ["T", "   1    8 1", " ", "", "", " 12.10", "", "", "", "", "", "", "", ""]
+    (raw / "tycho-1" / "hip_main.dat").write_text("|".join(hip) + "\n")
+    (raw / "tycho-1" / "tyc_main.dat").write_text("|".join(tyc) + "\n")
+
+    crossref = "   6805".ljust(31) + "   5413".ljust(33) + "  12" + "alf"
+    (raw / "IV_27A" / "catalog.dat").write_text(crossref + "\n")
+    (raw / "iau-star-names" / "iau-star-names-2024.csv").write_text(
+        "name,designation,hip\nStarname,HIP 5413,5413\n"
+    )
+
+    build = tmp_path / "build"
+    build.mkdir()
+
+    return raw, build
+
+
+def read_lines(filename):
+    with open(filename, "r", newline="") as infile:
+        return infile.readlines()
+
+
+@pytest.mark.parametrize("platform,expected", [("linux", 2048), ("darwin", 2)])
+def test_peak_rss_mb(monkeypatch, platform, expected):
+    class Usage:
+        ru_maxrss = 2 * 1024 * 1024
+
+    monkeypatch.setattr(stars.sys, "platform", platform)
+    monkeypatch.setattr(stars.resource, "getrusage", lambda who: Usage)
+
+    assert stars.peak_rss_mb() == expected
+
+
+def test_build(raw_data):
+    raw, build = raw_data
+
+    metrics = stars.build(data_path=raw, build_path=build, workers=1)
+
+    filename = build / f"bigsky.{stars.VERSION}.stars.csv"
+    filename_mag11 = build / f"bigsky.{stars.VERSION}.stars.mag11.csv"
+
+    lines = read_lines(filename)
+    lines_mag11 = read_lines(filename_mag11)
+
+    assert lines[0] == ",".join(StarRow.header()) + "\r\n"
+    assert len(lines) == 1 + 1 + 3 + 4  # header, extra, tyc2, suppl
+    # sorted by magnitude
+    assert lines[1].startswith(",55203,,4.26,")  # extra star
+    assert lines[2].startswith("1-13-1,,,8.51,")
+    assert lines[-2].startswith("1-16-1,,,12.03,")
+    assert lines[-1].startswith("1-8-1,,,12.1,")  # magnitude from Tycho-1
+    assert lines[6].startswith("22-341-2,5413,B,11.5,")
+    assert lines[6].strip().endswith(",1.77,Starname,6805,α,12,cet")
+
+    # magnitude tiers are prefixes of the sorted file
+    assert lines_mag11 == lines[: 1 + 4]
+    assert read_lines(build / f"bigsky.{stars.VERSION}.stars.mag10.csv") == lines[:3]
+    assert read_lines(build / f"bigsky.{stars.VERSION}.stars.mag6.csv") == lines[:2]
+
+    assert metrics["total"]["rows"] == 8
+    assert metrics["total"]["errors"] == 0
+    assert metrics["total"]["peak_rss_mb"] > 0
+    assert list(metrics["pipeline"].keys()) == [
+        "parse",
+        "crossmatch",
+        "photometry",
+        "astrometry",
+        "constellation",
+        "identify",
+        "write",
+    ]
+    assert [metrics["stages"][s]["rows"] for s in stars.STAGES] == [1, 3, 4]
+    assert (
+        json.loads((build / f"bigsky.{stars.VERSION}.stars.metrics.json").read_text())
+        == metrics
+    )
+
+    # parallel build must produce the same files
+    stars.build(data_path=raw, build_path=build, workers=2)
+
+    assert read_lines(filename) == lines
+    assert read_lines(filename_mag11) == lines_mag11
+
+
+def test_build_incremental(raw_data):
+    raw, build = raw_data
+    filename = build / f"bigsky.{stars.VERSION}.stars.csv"
+
+    stars.build(data_path=raw, build_path=build, formats=["csv"])
+    lines = read_lines(filename)
+
+    # only the names changed, so all shards are loaded from their artifacts
+    (raw / "iau-star-names" / "iau-star-names-2024.csv").write_text(
+        "name,designation,hip\nNewname,HIP 5413,5413\n"
+    )
+    metrics = stars.build(data_path=raw, build_path=build, formats=["csv"])
+
+    assert [metrics["stages"][s]["cached"] for s in stars.STAGES] == [1, 20, 1]
+    assert "astrometry" not in metrics["pipeline"]
+    assert metrics["total"]["rows"] == 8
+    assert read_lines(filename) == [
+        line.replace("Starname", "Newname") for line in lines
+    ]
+
+    # a changed Tycho-2 file only rebuilds its own shard
+    with open(raw / "tycho-2" / "tyc2.dat.00", "a") as outfile:
+        outfile.write(read_lines(DATA_PATH / "tyc2.dat")[0])
+
+    metrics = stars.build(data_path=raw, build_path=build, formats=["csv"])
+    manifest = json.loads((build / "cache" / "manifest.json").read_text())
+
+    assert [metrics["stages"][s]["cached"] for s in stars.STAGES] == [1, 19, 1]
+    assert metrics["stages"]["tycho2"]["rows"] == 4
+    assert not manifest["shards"]["tyc2.00"]["cached"]
+    assert manifest["shards"]["tyc2.01"]["cached"]
+    assert "iau-star-names/iau-star-names-2024.csv" in manifest["inputs"]
+    assert len(list((build / "cache" / "shards").glob("tyc2.00.*.npz"))) == 1
+
+
+def test_build_rebuilds_shards_on_new_ephemeris(raw_data, monkeypatch):
+    raw, build = raw_data
+
+    stars.build(data_path=raw, build_path=build, formats=["csv"])
+
+    version = stars.astrometry_version()
+    monkeypatch.setattr(
+        stars, "astrometry_version", lambda: version.replace(" ", " changed ", 1)
+    )
+    metrics = stars.build(data_path=raw, build_path=build, formats=["csv"])
+
+    assert [metrics["stages"][s]["cached"] for s in stars.STAGES] == [0, 0, 0]
+    assert "astrometry" in metrics["pipeline"]
+
+    monkeypatch.setattr(stars, "PIPELINE_VERSION", stars.PIPELINE_VERSION + 1)
+    metrics = stars.build(data_path=raw, build_path=build, formats=["csv"])
+
+    assert [metrics["stages"][s]["cached"] for s in stars.STAGES] == [0, 0, 0]
+
+
+def test_build_reuses_stored_astrometry(raw_data, monkeypatch):
+    raw, build = raw_data
+    filename = build / f"bigsky.{stars.VERSION}.stars.csv"
+
+    stars.build(data_path=raw, build_path=build, formats=["csv"])
+    lines = read_lines(filename)
+
+    assert list((build / "cache" / "astrometry").glob("*.npz"))
+
+    def propagate(*args, **kwargs):
+        raise AssertionError("positions should be loaded from the store")
+
+    monkeypatch.setattr(stars, "to_j2000_batch", propagate)
+    monkeypatch.setattr(stars, "constellations_at", propagate)
+
+    # a Tycho-1 magnitude changes, so all shards are built again, but their positions are unchanged
+    hip_main = raw / "tycho-1" / "hip_main.dat"
+    hip_main.write_text(hip_main.read_text().replace(" 11.50", " 11.40"))
+    metrics = stars.build(data_path=raw, build_path=build, formats=["csv"])
+
+    assert metrics["stages"]["tycho2"]["cached"] == 0
+    assert read_lines(filename) == [line.replace(",11.5,", ",11.4,") for line in lines]
+
+
+def test_build_prunes_astrometry_store(raw_data, monkeypatch):
+    raw, build = raw_data
+    store = build / "cache" / "astrometry"
+
+    stars.build(data_path=raw, build_path=build, formats=["csv"])
+    entries = set(store.glob("*.npz"))
+
+    # a new ephemeris replaces the stored J2000 positions, and the entries of the old one are removed
+    version = stars.astrometry_version()
+    monkeypatch.setattr(
+        stars, "astrometry_version", lambda: version.replace(" ", " changed ", 1)
+    )
+    stars.build(data_path=raw, build_path=build, formats=["csv"])
+    new_entries = set(store.glob("*.npz"))
+
+    # the constellations are stored by position, so only those entries are reused
+    assert len(new_entries) == len(entries)
+    assert entries - new_entries
+
+
+def test_store_chunks():
+    rng = np.random.default_rng(42)
+    ra, dec = rng.uniform(0, 360, 5000), rng.uniform(-90, 90, 5000)
+    chunks = stars.store_chunks([ra, dec], size=50)
+
+    assert chunks[0].start == 0 and chunks[-1].stop == 5000
+    assert all(a.stop == b.start for a, b in zip(chunks, chunks[1:]))
+    assert 50 < len(chunks) < 150
+
+    # a new row only changes its own chunk
+    inserted = [np.insert(ra, 2500, 1.0), np.insert(dec, 2500, 2.0)]
+    before = {(ra[c].tobytes(), dec[c].tobytes()) for c in chunks}
+    after = {
+        (inserted[0][c].tobytes(), inserted[1][c].tobytes())
+        for c in stars.store_chunks(inserted, size=50)
+    }
+
+    assert len(after - before) == 1
+
+
+def test_build_reuses_stored_astrometry_after_insert(tmp_path, monkeypatch):
+    raw, build = tmp_path / "raw", tmp_path / "build"
+    write_raw(raw, 2000)
+    monkeypatch.setattr(stars, "STORE_CHUNK", 10)
+
+    stars.build(data_path=raw, build_path=build, formats=["csv"])
+
+    propagated = []
+    to_j2000_batch = stars.to_j2000_batch
+
+    def count_rows(ra, *args, **kwargs):
+        propagated.append(len(ra))
+        return to_j2000_batch(ra, *args, **kwargs)
+
+    monkeypatch.setattr(stars, "to_j2000_batch", count_rows)
+
+    # a line inserted at the start of a Tycho-2 file only propagates the stars of its chunk again
+    filename = raw / "tycho-2" / "tyc2.dat.00"
+    lines = filename.read_bytes().splitlines(keepends=True)
+    filename.write_bytes(lines[-1] + b"".join(lines))
+    metrics = stars.build(data_path=raw, build_path=build, formats=["csv"])
+
+    assert metrics["stages"]["tycho2"]["cached"] == 19
+    assert metrics["stages"]["tycho2"]["rows"] == 2001
+    assert 0 < sum(propagated) < 40
+
+
+def test_build_stages(raw_data):
+    raw, build = raw_data
+
+    metrics = stars.build(
+        data_path=raw, build_path=build, stages=["suppl"], formats=["csv"]
+    )
+
+    lines = read_lines(build / f"bigsky.{stars.VERSION}.stars.csv")
+
+    assert len(lines) == 1 + 4
+    assert list(metrics["stages"].keys()) == ["suppl", "references", "merge"]
+
+
+def test_build_columnar(raw_data):
+    pq = pytest.importorskip("pyarrow.parquet")
+    raw, build = raw_data
+
+    stars.build(data_path=raw, build_path=build, formats=["numpy", "parquet"])
+
+    assert not (build / f"bigsky.{stars.VERSION}.stars.csv").exists()
+
+    catalog = Catalog(build / f"bigsky.{stars.VERSION}.stars")
+
+    # sorted by sky tile, then magnitude
+    assert list(catalog.decode("tyc_id")) == [
+        "1-16-1",
+        "2-976-1",
+        "2-580-1",
+        "2-1127-2",
+        "1-13-1",
+        "1-8-1",
+        "22-341-2",
+        "",
+    ]
+    assert len(catalog) == 8
+    assert catalog.categories("constellation") == ["cet", "psc", "uma"]
+    assert catalog.hip_id.dtype == np.int32
+    assert list(catalog.hip_id) == [0, 0, 0, 1397, 0, 0, 5413, 55203]
+    assert catalog.ra.dtype == np.float32
+    assert catalog.ra[6] == pytest.approx(17.3031)
+    assert list(catalog.constellation) == [1, 1, 1, 1, 1, 1, 0, 2]
+    assert list(np.diff(catalog.tile_offsets()).nonzero()[0]) == list(
+        np.unique(catalog.tiling.tile(catalog.ra, catalog.dec))
+    )
+
+    table = pq.read_table(build / f"bigsky.{stars.VERSION}.stars.parquet")
+
+    assert table.num_rows == 8
+    assert table.column("hip_id").to_pylist() == [None] * 3 + [
+        1397,
+        None,
+        None,
+        5413,
+        55203,
+    ]
+    assert table.column("name").to_pylist()[6] == "Starname"
+    assert table.column("bv").to_pylist()[6] is None
+
+
+def test_build_cone_search(raw_data):
+    raw, build = raw_data
+
+    stars.build(data_path=raw, build_path=build, formats=["numpy"])
+
+    catalog = Catalog(build / f"bigsky.{stars.VERSION}.stars")
+
+    def tyc_ids(index):
+        return sorted(catalog.decode("tyc_id", index))
+
+    assert tyc_ids(catalog.cone_search(2, 2, 1)) == ["1-13-1", "1-16-1", "1-8-1"]
+    assert tyc_ids(catalog.cone_search(2, 2, 1, mag_limit=12.05)) == [
+        "1-13-1",
+        "1-16-1",
+    ]
+    assert tyc_ids(catalog.cone_search(2, 2, 3)) == [
+        "1-13-1",
+        "1-16-1",
+        "1-8-1",
+        "2-1127-2",
+        "2-580-1",
+        "2-976-1",
+    ]
+    assert len(catalog.cone_search(170, 30, 2)) == 1
+    assert len(catalog.cone_search(170, 30, 2, mag_limit=4)) == 0
+    assert len(catalog.cone_search(0, 90, 60)) == 1
+
+
+def test_cli_build_stars(raw_data, capsys):
+    raw, build = raw_data
+
+    main(
+        [
+            "build",
+            "stars",
+            "--data",
+            str(raw),
+            "--output",
+            str(build / "out"),
+            "--stages",
+            "extra,tycho2",
+        ]
+    )
+
+    metrics = json.loads(capsys.readouterr().out)
+
+    assert metrics["total"]["rows"] == 4
+    assert (build / "out" / f"bigsky.{stars.VERSION}.stars.csv").exists()
+
+
+def test_cli_unknown_stage():
+    with pytest.raises(SystemExit):
+        main(["build", "stars", "--stages", "tycho3"])
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from src.bigsky.tiling import Tiling, separation, tile_ranges
+
+
+def test_tiling():
+    tiling = Tiling(zone_height=2)
+
+    assert tiling.zones == 90
+    assert tiling.zone_tiles[45] == 180  # equator
+    assert tiling.zone_tiles[0] == tiling.zone_tiles[-1] == 7  # poles
+    assert tiling.count == tiling.zone_tiles.sum()
+
+    tiles = tiling.tile([0, 359.99, 1.9, 2.1, 0, 0], [0, 0, 0, 0, -90, 90])
+
+    assert list(tiles) == [
+        tiling.zone_offsets[45],
+        tiling.zone_offsets[45] + 179,
+        tiling.zone_offsets[45],
+        tiling.zone_offsets[45] + 1,
+        0,
+        tiling.count - 7,
+    ]
+
+
+@pytest.mark.parametrize(
+    "ra,dec,radius",
+    [
+        (10, 20, 3),
+        (359.5, 0, 1),  # wraps around RA 0
+        (180, -88, 5),  # contains the south pole
+        (45, 80, 9),
+        (200, 60, 0.1),
+    ],
+)
+def test_tiles_in_cone(ra, dec, radius):
+    tiling = Tiling()
+    rng = np.random.default_rng(42)
+    ra_points = rng.uniform(0, 360, 200_000)
+    dec_points = np.degrees(np.arcsin(rng.uniform(-1, 1, 200_000)))
+
+    inside = separation(ra, dec, ra_points, dec_points) <= radius
+    tiles = tiling.tiles_in_cone(ra, dec, radius)
+
+    assert inside.any()
+    assert np.isin(tiling.tile(ra_points[inside], dec_points[inside]), tiles).all()
+
+
+@pytest.mark.parametrize(
+    "ra_min,ra_max,dec_min,dec_max",
+    [
+        (10, 20, -5, 5),
+        (350, 10, 30, 40),  # wraps around RA 0
+        (0, 360, 85, 90),
+        (100, 100.5, -89.5, -60),
+    ],
+)
+def test_tiles_in_box(ra_min, ra_max, dec_min, dec_max):
+    tiling = Tiling()
+    rng = np.random.default_rng(42)
+    ra_points = rng.uniform(0, 360, 200_000)
+    dec_points = np.degrees(np.arcsin(rng.uniform(-1, 1, 200_000)))
+
+    if ra_min <= ra_max:
+        in_ra = (ra_points >= ra_min) & (ra_points <= ra_max)
+    else:
+        in_ra = (ra_points >= ra_min) | (ra_points <= ra_max)
+
+    inside = in_ra & (dec_points >= dec_min) & (dec_points <= dec_max)
+    tiles = tiling.tiles_in_box(ra_min, ra_max, dec_min, dec_max)
+
+    assert inside.any()
+    assert np.isin(tiling.tile(ra_points[inside], dec_points[inside]), tiles).all()
+
+
+def test_tile_ranges():
+    assert tile_ranges([]) == []
+    assert tile_ranges([3]) == [(3, 3)]
+    assert tile_ranges([1, 2, 3, 7, 9, 10]) == [(1, 3), (7, 7), (9, 10)]
+
+
+def test_sort():
+    tiling = Tiling()
+    order, offsets = tiling.sort(
+        [10, 10.5, 200, 10.2], [5, 5.1, -30, 5.2], [9, 3, 1, 5]
+    )
+
+    assert list(order) == [2, 1, 3, 0]
+    assert len(offsets) == tiling.count + 1
+    assert offsets[-1] == 4
+
+
+def test_separation():
+    assert separation(0, 0, 90, 0) == pytest.approx(90)
+    assert separation(359, 0, 1, 0) == pytest.approx(2)
+    assert separation(10, 90, 200, 89) == pytest.approx(1)
@@ -0,0 +1,146 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class Tiling:
+    """
+    Divides the sky into tiles of roughly equal area: declination zones of `zone_height` degrees, with each zone
+    divided into RA tiles that are about `zone_height` degrees wide (at the zone's edge closest to the equator).
+
+    Tiles are numbered from the south pole (zone 0) to the north pole, and by increasing RA within each zone.
+    """
+
+    zone_height: float = 2.0
+
+    zones: int = field(init=False)
+    zone_tiles: np.ndarray = field(init=False, repr=False)
+    """Number of tiles in each zone"""
+
+    zone_offsets: np.ndarray = field(init=False, repr=False)
+    """Number of the first tile of each zone"""
+
+    def __post_init__(self):
+        self.zones = int(np.ceil(180 / self.zone_height))
+        lo = -90 + np.arange(self.zones) * self.zone_height
+        hi = np.minimum(lo + self.zone_height, 90)
+        widest = np.cos(
+            np.radians(np.where(lo * hi <= 0, 0, np.minimum(abs(lo), abs(hi))))
+        )
+        self.zone_tiles = np.maximum(
+            1, np.ceil(360 * widest / self.zone_height)
+        ).astype(np.int64)
+        self.zone_offsets = np.concatenate([[0], np.cumsum(self.zone_tiles)[:-1]])
+
+    @property
+    def count(self) -> int:
+        """Total number of tiles"""
+        return int(self.zone_tiles.sum())
+
+    def to_dict(self) -> dict:
+        return {"zone_height": self.zone_height}
+
+    def zone(self, dec) -> np.ndarray:
+        zone = np.floor((np.asarray(dec, dtype=float) + 90) / self.zone_height)
+        return np.clip(zone, 0, self.zones - 1).astype(np.int64)
+
+    def tile(self, ra, dec) -> np.ndarray:
+        """Returns the tile of each position (in degrees)"""
+        zone = self.zone(dec)
+        tiles = self.zone_tiles[zone]
+        ra_tile = np.floor(np.mod(np.asarray(ra, dtype=float), 360) / 360 * tiles)
+        return self.zone_offsets[zone] + np.minimum(ra_tile, tiles - 1).astype(np.int64)
+
+    def tiles_in_cone(self, ra: float, dec: float, radius: float) -> np.ndarray:
+        """Returns the (sorted) tiles that overlap a cone, with all values in degrees"""
+        dec_min, dec_max = dec - radius, dec + radius
+
+        if dec_max >= 90 or dec_min <= -90:
+            # the cone contains a pole, so it covers all RA
+            ra_half_width = 180
+        else:
+            ra_half_width = np.degrees(
+                np.arcsin(min(1, np.sin(np.radians(radius)) / np.cos(np.radians(dec))))
+            )
+
+        result = []
+
+        for zone in range(
+            self.zone(max(dec_min, -90)), self.zone(min(dec_max, 90)) + 1
+        ):
+            tiles = self.zone_tiles[zone]
+            offset = self.zone_offsets[zone]
+
+            if ra_half_width >= 180:
+                result.append(offset + np.arange(tiles))
+                continue
+
+            width = 360 / tiles
+            first = int(np.floor((ra - ra_half_width) / width))
+            last = int(np.floor((ra + ra_half_width) / width))
+            ra_tiles = np.unique(np.mod(np.arange(first, last + 1), tiles))
+            result.append(offset + ra_tiles)
+
+        return np.unique(np.concatenate(result)) if result else np.empty(0, np.int64)
+
+    def tiles_in_box(
+        self, ra_min: float, ra_max: float, dec_min: float, dec_max: float
+    ) -> np.ndarray:
+        """
+        Returns the (sorted) tiles that overlap a box of RA and declination, with all values in degrees. The box
+        wraps around RA 0 if `ra_min` is greater than `ra_max`.
+        """
+        ra_width = ra_max - ra_min if ra_max >= ra_min else (ra_max - ra_min) % 360
+        ra_min = ra_min % 360
+        ra_max = ra_min + min(ra_width, 360)
+
+        result = []
+
+        for zone in range(
+            self.zone(max(dec_min, -90)), self.zone(min(dec_max, 90)) + 1
+        ):
+            tiles = self.zone_tiles[zone]
+            width = 360 / tiles
+            first = int(np.floor(ra_min / width))
+            last = min(int(np.floor(ra_max / width)), first + tiles - 1)
+            ra_tiles = np.unique(np.mod(np.arange(first, last + 1), tiles))
+            result.append(self.zone_offsets[zone] + ra_tiles)
+
+        return np.unique(np.concatenate(result)) if result else np.empty(0, np.int64)
+
+    def sort(self, ra, dec, magnitude) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the order that sorts positions by tile and then by magnitude, and the offsets of each tile in the
+        sorted positions: tile `t` is `[offsets[t], offsets[t + 1])`.
+        """
+        tiles = self.tile(ra, dec)
+        order = np.lexsort((np.asarray(magnitude, dtype=float), tiles))
+        offsets = np.searchsorted(tiles[order], np.arange(self.count + 1))
+        return order, offsets
+
+
+def tile_ranges(tiles) -> list[tuple[int, int]]:
+    """Returns sorted tiles as (first, last) ranges of consecutive tiles, e.g. for `BETWEEN` clauses in SQL"""
+    tiles = np.asarray(tiles, dtype=np.int64)
+
+    if len(tiles) == 0:
+        return []
+
+    breaks = np.flatnonzero(np.diff(tiles) != 1) + 1
+    firsts = tiles[np.concatenate([[0], breaks])]
+    lasts = tiles[np.concatenate([breaks - 1, [len(tiles) - 1]])]
+
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+
+def separation(ra1, dec1, ra2, dec2) -> np.ndarray:
+    """Returns the angular separation (in degrees) between positions in degrees, with the haversine formula"""
+    ra1, dec1, ra2, dec2 = (
+        np.radians(np.asarray(v, dtype=float)) for v in (ra1, dec1, ra2, dec2)
+    )
+    a = (
+        np.sin((dec2 - dec1) / 2) ** 2
+        + np.cos(dec1) * np.cos(dec2) * np.sin((ra2 - ra1) / 2) ** 2
+    )
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))))